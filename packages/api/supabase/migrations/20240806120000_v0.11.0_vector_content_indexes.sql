@@ -0,0 +1,71 @@
+-- Approximate nearest neighbor index on the embeddings, so similarity searches don't have to
+-- compare the query against every vector. HNSW needs pgvector 0.5.0 or later, older versions
+-- get an IVFFlat index instead.
+--
+-- IVFFlat picks its lists from the rows present when the index is built, and this migration
+-- usually runs against an empty or nearly empty table, so recall is poor until the index is
+-- rebuilt. On pgvector older than 0.5.0, once the vector stores are loaded run
+--   reindex index concurrently vector_content_embedding_idx;
+-- and, for more than ~1M rows, recreate it with lists = rows / 1000. HNSW doesn't need this.
+do $$
+begin
+  if string_to_array((select extversion from pg_extension where extname = 'vector'), '.')::int[]
+     >= array[0, 5, 0] then
+    create index if not exists vector_content_embedding_idx on vector_content
+      using hnsw (embedding vector_cosine_ops) with (m = 16, ef_construction = 64);
+  else
+    create index if not exists vector_content_embedding_idx on vector_content
+      using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+  end if;
+end;
+$$;
+
+-- Lets small vector stores be searched exactly by fetching only their own rows
+create index if not exists vector_content_vector_store_id_user_id_idx
+  on vector_content (vector_store_id, user_id);
+
+-- Replace match_vectors with a version that can tune the approximate search per query
+drop function if exists match_vectors (vector (768), uuid, uuid, int, jsonb);
+
+create function match_vectors (
+  query_embedding vector (768), -- Instructor-XL produces 768-length embeddings
+  vs_id uuid,
+  user_id uuid,
+  match_limit int,
+  filter jsonb default '{}',
+  ef_search int default null, -- HNSW candidate list size, higher trades speed for recall
+  probes int default null -- IVFFlat lists searched, higher trades speed for recall
+) returns table (
+  id uuid,
+  vector_store_id uuid,
+  file_id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql as $$
+#variable_conflict use_column
+begin
+  -- Only applies to this request's transaction
+  if ef_search is not null then
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', probes::text, true);
+  end if;
+
+  return query
+  select
+    id,
+    vector_store_id,
+    file_id,
+    content,
+    metadata,
+    1 - (vector_content.embedding <=> query_embedding) as similarity
+  from vector_content
+  where vector_store_id = vs_id
+    and vector_content.user_id = match_vectors.user_id
+    and metadata @> filter
+  order by vector_content.embedding <=> query_embedding
+  limit match_limit;
+end;
+$$;
@@ -0,0 +1,43 @@
+-- Search several vector stores at once, returning their merged top matches
+create function match_vectors_multi (
+  query_embedding vector (768), -- Instructor-XL produces 768-length embeddings
+  vs_ids uuid[],
+  user_id uuid,
+  match_limit int,
+  filter jsonb default '{}',
+  ef_search int default null, -- HNSW candidate list size, higher trades speed for recall
+  probes int default null -- IVFFlat lists searched, higher trades speed for recall
+) returns table (
+  id uuid,
+  vector_store_id uuid,
+  file_id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql as $$
+#variable_conflict use_column
+begin
+  -- Only applies to this request's transaction
+  if ef_search is not null then
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', probes::text, true);
+  end if;
+
+  return query
+  select
+    id,
+    vector_store_id,
+    file_id,
+    content,
+    metadata,
+    1 - (vector_content.embedding <=> query_embedding) as similarity
+  from vector_content
+  where vector_store_id = any(vs_ids)
+    and vector_content.user_id = match_vectors_multi.user_id
+    and metadata @> filter
+  order by vector_content.embedding <=> query_embedding
+  limit match_limit;
+end;
+$$;
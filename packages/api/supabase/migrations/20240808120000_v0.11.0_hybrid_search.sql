@@ -0,0 +1,88 @@
+-- Full-text search over the chunks, so exact terms like part numbers and acronyms can be
+-- matched alongside the embeddings
+alter table vector_content
+  add column if not exists fts tsvector
+  generated always as (to_tsvector('english', coalesce(content, ''))) stored;
+
+create index if not exists vector_content_fts_idx on vector_content using gin (fts);
+
+-- Search several vector stores by both full-text rank and vector similarity, fusing the two
+-- rankings with reciprocal rank fusion (RRF). Each ranking contributes weight / (rrf_k + rank)
+-- for the rows it found; similarity is still the row's cosine similarity to the query.
+create function match_hybrid (
+  query_text text,
+  query_embedding vector (768), -- Instructor-XL produces 768-length embeddings
+  vs_ids uuid[],
+  user_id uuid,
+  match_limit int,
+  filter jsonb default '{}',
+  full_text_weight float default 1,
+  semantic_weight float default 1,
+  rrf_k int default 60,
+  ef_search int default null, -- HNSW candidate list size, higher trades speed for recall
+  probes int default null -- IVFFlat lists searched, higher trades speed for recall
+) returns table (
+  id uuid,
+  vector_store_id uuid,
+  file_id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql as $$
+#variable_conflict use_column
+begin
+  -- Only applies to this request's transaction
+  if ef_search is not null then
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', probes::text, true);
+  end if;
+
+  return query
+  with full_text as (
+    select
+      vector_content.id,
+      row_number() over (
+        order by ts_rank_cd(vector_content.fts, websearch_to_tsquery('english', query_text)) desc
+      ) as rank_ix
+    from vector_content
+    where vector_content.vector_store_id = any(vs_ids)
+      and vector_content.user_id = match_hybrid.user_id
+      and vector_content.metadata @> filter
+      and vector_content.fts @@ websearch_to_tsquery('english', query_text)
+    order by rank_ix
+    limit match_limit * 2
+  ),
+  semantic as (
+    -- Ranked after the limit so the nearest neighbors can come from the embedding index
+    select nearest.id, row_number() over (order by nearest.distance) as rank_ix
+    from (
+      select
+        vector_content.id,
+        vector_content.embedding <=> query_embedding as distance
+      from vector_content
+      where vector_content.vector_store_id = any(vs_ids)
+        and vector_content.user_id = match_hybrid.user_id
+        and vector_content.metadata @> filter
+      order by vector_content.embedding <=> query_embedding
+      limit match_limit * 2
+    ) as nearest
+  )
+  select
+    vector_content.id,
+    vector_content.vector_store_id,
+    vector_content.file_id,
+    vector_content.content,
+    vector_content.metadata,
+    1 - (vector_content.embedding <=> query_embedding) as similarity
+  from full_text
+  full outer join semantic on full_text.id = semantic.id
+  join vector_content on coalesce(full_text.id, semantic.id) = vector_content.id
+  order by
+    coalesce(1.0 / (rrf_k + full_text.rank_ix), 0.0) * full_text_weight +
+    coalesce(1.0 / (rrf_k + semantic.rank_ix), 0.0) * semantic_weight
+    desc
+  limit match_limit;
+end;
+$$;
@@ -0,0 +1,221 @@
+-- The approximate indexes return their ef_search (HNSW) or probes (IVFFlat) nearest
+-- candidates before the vector store and user filters are applied. A store that holds a small
+-- share of vector_content can then get back fewer than match_limit rows, or none.
+--
+-- tune_vector_search prepares a search over some vector stores for the current transaction:
+--   * pgvector 0.8.0 and later keep scanning the index until enough rows pass the filters
+--   * older versions search the stores exactly when they are small enough to compare against
+--     every row, or the candidate list needed to find match_limit of their rows would exceed
+--     HNSW's limit of 1000, and otherwise widen ef_search to that size
+create function tune_vector_search (
+  vs_ids uuid[],
+  user_id uuid,
+  match_limit int,
+  ef_search int default null, -- HNSW candidate list size, higher trades speed for recall
+  probes int default null, -- IVFFlat lists searched, higher trades speed for recall
+  exact_scan_rows int default 20000 -- stores with at most this many rows are searched exactly
+) returns void language plpgsql as $$
+declare
+  candidates bigint;
+  total_rows float;
+  needed_ef float;
+begin
+  -- Only applies to this request's transaction
+  if ef_search is not null then
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', probes::text, true);
+  end if;
+
+  if string_to_array((select extversion from pg_extension where extname = 'vector'), '.')::int[]
+     >= array[0, 8, 0] then
+    perform set_config('hnsw.iterative_scan', 'strict_order', true);
+    perform set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    return;
+  end if;
+
+  -- Counting stops at exact_scan_rows + 1, so this stays cheap for large stores
+  select count(*) into candidates
+  from (
+    select 1
+    from vector_content
+    where vector_content.vector_store_id = any(vs_ids)
+      and vector_content.user_id = tune_vector_search.user_id
+    limit exact_scan_rows + 1
+  ) as store_rows;
+
+  select greatest(reltuples, candidates, 1) into total_rows
+  from pg_class
+  where oid = 'vector_content'::regclass;
+
+  -- Candidates to fetch for match_limit of them to belong to these stores, on average
+  needed_ef := match_limit * total_rows / greatest(candidates, 1);
+
+  if candidates <= exact_scan_rows or needed_ef > 1000 then
+    -- Leaves the embedding index unused, the stores' rows come from the vector_store_id index
+    perform set_config('enable_indexscan', 'off', true);
+  elsif needed_ef > coalesce(ef_search, 40) then
+    perform set_config('hnsw.ef_search', ceil(needed_ef)::int::text, true);
+  end if;
+end;
+$$;
+
+-- The searches below run as dynamic SQL so they are planned on every call, with the settings
+-- tune_vector_search made. Cached plans would ignore a change to enable_indexscan.
+create or replace function match_vectors (
+  query_embedding vector (768), -- Instructor-XL produces 768-length embeddings
+  vs_id uuid,
+  user_id uuid,
+  match_limit int,
+  filter jsonb default '{}',
+  ef_search int default null, -- HNSW candidate list size, higher trades speed for recall
+  probes int default null -- IVFFlat lists searched, higher trades speed for recall
+) returns table (
+  id uuid,
+  vector_store_id uuid,
+  file_id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql as $$
+begin
+  perform tune_vector_search(
+    array[vs_id], match_vectors.user_id, match_limit, ef_search, probes
+  );
+
+  return query execute $query$
+    select
+      id,
+      vector_store_id,
+      file_id,
+      content,
+      metadata,
+      1 - (embedding <=> $1) as similarity
+    from vector_content
+    where vector_store_id = $2
+      and user_id = $3
+      and metadata @> $4
+    order by embedding <=> $1
+    limit $5
+  $query$
+  using query_embedding, vs_id, match_vectors.user_id, filter, match_limit;
+end;
+$$;
+
+create or replace function match_vectors_multi (
+  query_embedding vector (768), -- Instructor-XL produces 768-length embeddings
+  vs_ids uuid[],
+  user_id uuid,
+  match_limit int,
+  filter jsonb default '{}',
+  ef_search int default null, -- HNSW candidate list size, higher trades speed for recall
+  probes int default null -- IVFFlat lists searched, higher trades speed for recall
+) returns table (
+  id uuid,
+  vector_store_id uuid,
+  file_id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql as $$
+begin
+  perform tune_vector_search(
+    vs_ids, match_vectors_multi.user_id, match_limit, ef_search, probes
+  );
+
+  return query execute $query$
+    select
+      id,
+      vector_store_id,
+      file_id,
+      content,
+      metadata,
+      1 - (embedding <=> $1) as similarity
+    from vector_content
+    where vector_store_id = any($2)
+      and user_id = $3
+      and metadata @> $4
+    order by embedding <=> $1
+    limit $5
+  $query$
+  using query_embedding, vs_ids, match_vectors_multi.user_id, filter, match_limit;
+end;
+$$;
+
+create or replace function match_hybrid (
+  query_text text,
+  query_embedding vector (768), -- Instructor-XL produces 768-length embeddings
+  vs_ids uuid[],
+  user_id uuid,
+  match_limit int,
+  filter jsonb default '{}',
+  full_text_weight float default 1,
+  semantic_weight float default 1,
+  rrf_k int default 60,
+  ef_search int default null, -- HNSW candidate list size, higher trades speed for recall
+  probes int default null -- IVFFlat lists searched, higher trades speed for recall
+) returns table (
+  id uuid,
+  vector_store_id uuid,
+  file_id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql as $$
+begin
+  -- The semantic ranking fetches match_limit * 2 nearest neighbors
+  perform tune_vector_search(
+    vs_ids, match_hybrid.user_id, match_limit * 2, ef_search, probes
+  );
+
+  return query execute $query$
+    with full_text as (
+      select
+        vector_content.id,
+        row_number() over (
+          order by ts_rank_cd(vector_content.fts, websearch_to_tsquery('english', $1)) desc
+        ) as rank_ix
+      from vector_content
+      where vector_content.vector_store_id = any($3)
+        and vector_content.user_id = $4
+        and vector_content.metadata @> $6
+        and vector_content.fts @@ websearch_to_tsquery('english', $1)
+      order by rank_ix
+      limit $5 * 2
+    ),
+    semantic as (
+      -- Ranked after the limit so the nearest neighbors can come from the embedding index
+      select nearest.id, row_number() over (order by nearest.distance) as rank_ix
+      from (
+        select
+          vector_content.id,
+          vector_content.embedding <=> $2 as distance
+        from vector_content
+        where vector_content.vector_store_id = any($3)
+          and vector_content.user_id = $4
+          and vector_content.metadata @> $6
+        order by vector_content.embedding <=> $2
+        limit $5 * 2
+      ) as nearest
+    )
+    select
+      vector_content.id,
+      vector_content.vector_store_id,
+      vector_content.file_id,
+      vector_content.content,
+      vector_content.metadata,
+      1 - (vector_content.embedding <=> $2) as similarity
+    from full_text
+    full outer join semantic on full_text.id = semantic.id
+    join vector_content on coalesce(full_text.id, semantic.id) = vector_content.id
+    order by
+      coalesce(1.0 / ($9 + full_text.rank_ix), 0.0) * $7 +
+      coalesce(1.0 / ($9 + semantic.rank_ix), 0.0) * $8
+      desc
+    limit $5
+  $query$
+  using query_text, query_embedding, vs_ids, match_hybrid.user_id, match_limit, filter,
+    full_text_weight, semantic_weight, rrf_k;
+end;
+$$;
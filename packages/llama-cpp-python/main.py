@@ -1,4 +1,8 @@
+import asyncio
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, AsyncGenerator
 
 from llama_cpp import Llama
@@ -10,6 +14,22 @@ GPU_ENABLED = (
     False if os.environ.get("GPU_ENABLED", "False").lower() != "true" else True
 )
 
+# Number of Llama instances (each holding its own copy of the weights and context) to keep
+# loaded. A llama.cpp context can only run one generation at a time, so this is also the
+# number of requests that generate simultaneously; the rest wait for an instance to free up.
+NUM_INSTANCES = max(int(os.environ.get("LFAI_NUM_INSTANCES", 1)), 1)
+
+# Marks the end of a token stream produced by a generation thread
+_DONE = object()
+
+
+def load_llm(backend_config: BackendConfig) -> Llama:
+    return Llama(
+        model_path=backend_config.model.source,
+        n_ctx=backend_config.max_context_length,
+        n_gpu_layers=-1 if GPU_ENABLED is True else 0,
+    )
+
 
 @LLM
 class Model:
@@ -18,16 +38,24 @@ class Model:
     if not os.path.exists(backend_config.model.source):
         raise ValueError(f"Model path ({backend_config.model.source}) does not exist")
 
-    llm = Llama(
-        model_path=backend_config.model.source,
-        n_ctx=backend_config.max_context_length,
-        n_gpu_layers=-1 if GPU_ENABLED is True else 0,
-    )
+    def __init__(self):
+        self.llms = [load_llm(self.backend_config) for _ in range(NUM_INSTANCES)]
+        # Tokenizing does not touch the context, so any instance can count tokens
+        self.llm = self.llms[0]
+        self.idle_llms: asyncio.Queue[Llama] | None = None
+        self.executor = ThreadPoolExecutor(max_workers=NUM_INSTANCES)
 
-    async def generate(
-        self, prompt: str, config: GenerationConfig
-    ) -> AsyncGenerator[str, Any]:
-        for res in self.llm(
+    def _stream_tokens(
+        self,
+        llm: Llama,
+        prompt: str,
+        config: GenerationConfig,
+        loop: asyncio.AbstractEventLoop,
+        tokens: asyncio.Queue,
+        stop: threading.Event,
+    ):
+        """Run a blocking generation, handing each token to the event loop as it is produced."""
+        stream = llm(
             prompt,
             stream=True,
             temperature=config.temperature,
@@ -35,10 +63,56 @@ class Model:
             top_p=config.top_p,
             top_k=config.top_k,
             stop=self.backend_config.stop_tokens,
-        ):
-            yield res["choices"][0]["text"]  # type: ignore
+        )
+        try:
+            for res in stream:
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(
+                    tokens.put_nowait,
+                    res["choices"][0]["text"],  # type: ignore
+                )
+        except Exception as exc:
+            loop.call_soon_threadsafe(tokens.put_nowait, exc)
+        finally:
+            stream.close()
+            loop.call_soon_threadsafe(tokens.put_nowait, _DONE)
+
+    async def generate(
+        self, prompt: str, config: GenerationConfig
+    ) -> AsyncGenerator[str, Any]:
+        # The pool is created lazily so that it belongs to the server's event loop
+        if self.idle_llms is None:
+            self.idle_llms = asyncio.Queue()
+            for llm in self.llms:
+                self.idle_llms.put_nowait(llm)
+
+        if self.idle_llms.empty():
+            logging.debug("All Llama instances are busy, queueing request")
+        llm = await self.idle_llms.get()
+
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        worker = loop.run_in_executor(
+            self.executor, self._stream_tokens, llm, prompt, config, loop, tokens, stop
+        )
+        # Only hand the instance to the next request once this generation has let go of it
+        worker.add_done_callback(lambda _: self.idle_llms.put_nowait(llm))
+
+        try:
+            while (token := await tokens.get()) is not _DONE:
+                if isinstance(token, Exception):
+                    raise token
+                yield token
+        finally:
+            # Stops token generation when the client cancels the RPC mid-stream
+            stop.set()
 
     async def count_tokens(self, raw_text: str) -> int:
         string_bytes: bytes = bytes(raw_text, "utf-8")
         tokens: list[int] = self.llm.tokenize(string_bytes)
         return len(tokens)
+
+    async def tokenize(self, raw_text: str) -> list[int]:
+        return self.llm.tokenize(bytes(raw_text, "utf-8"))
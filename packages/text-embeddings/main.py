@@ -1,6 +1,9 @@
 import asyncio
+import functools
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 
 from InstructorEmbedding import INSTRUCTOR
 from leapfrogai_sdk import (
@@ -8,20 +11,139 @@ from leapfrogai_sdk import (
     EmbeddingRequest,
     EmbeddingResponse,
     GrpcContext,
+    RerankRequest,
+    RerankResponse,
     serve,
 )
 
+logger = logging.getLogger(__name__)
+
 model_dir = os.environ.get("LFAI_MODEL_PATH", ".model")
-model = INSTRUCTOR(model_dir)
+
+# Upper bounds on how many texts are coalesced into one encode call and how long the first
+# request in a batch waits for others to join it
+MAX_BATCH_SIZE = int(os.environ.get("LFAI_MAX_BATCH_SIZE", 64))
+MAX_BATCH_WAIT_MS = float(os.environ.get("LFAI_MAX_BATCH_WAIT_MS", 5))
+
+# Instructions that embed a query and the passages it is compared to asymmetrically when
+# reranking, which ranks them more sharply than the plain embeddings used for the first search
+RERANK_QUERY_INSTRUCTION = (
+    "Represent the question for retrieving supporting documents: "
+)
+RERANK_DOCUMENT_INSTRUCTION = "Represent the document for retrieval: "
+
+
+class EmbeddingBatcher:
+    """Coalesces the inputs of concurrent requests into batched `model.encode` calls.
+
+    Encoding runs on a dedicated worker thread so the gRPC event loop stays free to accept
+    (and batch) new requests while the model is busy.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], list[list[float]]],
+        max_batch_size: int,
+        max_batch_wait_ms: float,
+    ):
+        self.encode_batch = encode
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_batch_wait = max_batch_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue: asyncio.Queue | None = None
+        self.worker: asyncio.Task | None = None
+
+    async def encode(self, inputs: list[str]) -> list[list[float]]:
+        if not inputs:
+            return []
+
+        # The queue and worker are created lazily so they belong to the server's event loop
+        if self.worker is None:
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((inputs, future))
+        return await future
+
+    async def _collect(self) -> list[tuple[list[str], asyncio.Future]]:
+        """Wait for one request, then gather more until the batch is full or the wait expires."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_batch_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for inputs, _ in batch for text in inputs]
+
+            try:
+                embeddings = await loop.run_in_executor(
+                    self.executor, self.encode_batch, texts
+                )
+            except Exception as exc:
+                logger.exception("Failed to encode a batch of %d texts", len(texts))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            logger.debug("Encoded %d texts from %d requests", len(texts), len(batch))
+
+            # Scatter the results back to the requests in the order they were queued
+            offset = 0
+            for inputs, future in batch:
+                if not future.done():
+                    future.set_result(embeddings[offset : offset + len(inputs)])
+                offset += len(inputs)
 
 
 class InstructorEmbedding:
+    def __init__(self):
+        self.model = INSTRUCTOR(model_dir)
+        self.batcher = EmbeddingBatcher(
+            self.model.encode, MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS
+        )
+
     async def CreateEmbedding(self, request: EmbeddingRequest, context: GrpcContext):
-        embeddings = model.encode(request.inputs)
+        if not request.inputs:
+            return EmbeddingResponse(embeddings=[])
+
+        embeddings = await self.batcher.encode(list(request.inputs))
 
         embeddings = [Embedding(embedding=inner_list) for inner_list in embeddings]
         return EmbeddingResponse(embeddings=embeddings)
 
+    async def Rerank(self, request: RerankRequest, context: GrpcContext):
+        pairs = [[RERANK_QUERY_INSTRUCTION, request.query]] + [
+            [RERANK_DOCUMENT_INSTRUCTION, document] for document in request.documents
+        ]
+
+        # Shares the batcher's worker thread so reranks and embeddings don't contend for the model
+        embeddings = await asyncio.get_running_loop().run_in_executor(
+            self.batcher.executor,
+            functools.partial(self.model.encode, pairs, normalize_embeddings=True),
+        )
+
+        # Cosine similarity of each document to the query
+        scores = embeddings[1:] @ embeddings[0]
+        return RerankResponse(scores=scores.tolist())
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
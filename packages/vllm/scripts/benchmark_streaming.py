@@ -0,0 +1,113 @@
+"""Measure streaming latency and server CPU use of a running LeapfrogAI LLM backend.
+
+Sends concurrent ChatCompleteStream requests to the backend and reports time to first token,
+inter-token latency and, when the server's PID is given, the CPU time the server process spent
+while serving them. Run it against the backend before and after a change to compare the two.
+
+    python scripts/benchmark_streaming.py --target localhost:50051 --concurrency 8 --pid <PID>
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import grpc
+
+import leapfrogai_sdk as lfai
+
+
+def read_cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process, read from /proc (Linux only)."""
+    with open(f"/proc/{pid}/stat") as f:
+        # The command name may contain spaces, so split after its closing parenthesis
+        fields = f.read().rsplit(")", 1)[1].split()
+    utime, stime = int(fields[11]), int(fields[12])
+    return (utime + stime) / os.sysconf("SC_CLK_TCK")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+
+async def stream_once(
+    stub: lfai.ChatCompletionStreamServiceStub, prompt: str, max_tokens: int
+) -> tuple[float, list[float]]:
+    """Stream one chat completion, returning the time to first token and the gaps between chunks."""
+    request = lfai.ChatCompletionRequest(
+        chat_items=[lfai.ChatItem(role=lfai.ChatRole.USER, content=prompt)],
+        max_new_tokens=max_tokens,
+        temperature=0.1,
+    )
+
+    start = time.perf_counter()
+    last = None
+    first_token = 0.0
+    gaps: list[float] = []
+
+    async for response in stub.ChatCompleteStream(request):
+        if not response.choices or not response.choices[0].chat_item.content:
+            continue
+        now = time.perf_counter()
+        if last is None:
+            first_token = now - start
+        else:
+            gaps.append(now - last)
+        last = now
+
+    return first_token, gaps
+
+
+async def run(args: argparse.Namespace):
+    async with grpc.aio.insecure_channel(args.target) as channel:
+        stub = lfai.ChatCompletionStreamServiceStub(channel)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded():
+            async with semaphore:
+                return await stream_once(stub, args.prompt, args.max_tokens)
+
+        cpu_start = read_cpu_seconds(args.pid) if args.pid else None
+        wall_start = time.perf_counter()
+
+        results = await asyncio.gather(*(bounded() for _ in range(args.requests)))
+
+        wall = time.perf_counter() - wall_start
+        cpu = read_cpu_seconds(args.pid) - cpu_start if args.pid else None
+
+    ttfts = [ttft for ttft, _ in results]
+    gaps = [gap for _, request_gaps in results for gap in request_gaps]
+
+    print(f"requests:            {args.requests} ({args.concurrency} concurrent)")
+    print(f"wall time:           {wall:.2f}s")
+    print(
+        f"time to first token: p50 {statistics.median(ttfts) * 1000:.1f}ms, "
+        f"p99 {percentile(ttfts, 99) * 1000:.1f}ms"
+    )
+    print(
+        f"inter-token latency: p50 {percentile(gaps, 50) * 1000:.1f}ms, "
+        f"p99 {percentile(gaps, 99) * 1000:.1f}ms, "
+        f"stdev {statistics.pstdev(gaps) * 1000 if gaps else 0.0:.1f}ms"
+    )
+    if cpu is not None:
+        print(f"server CPU:          {cpu:.2f}s ({cpu / wall * 100:.0f}% of one core)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="localhost:50051")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument(
+        "--prompt", default="Write a short story about a frog that learns to fly."
+    )
+    parser.add_argument(
+        "--pid", type=int, default=None, help="PID of the backend server process"
+    )
+
+    asyncio.run(run(parser.parse_args()))
@@ -1,13 +1,9 @@
-import asyncio
 import json
 import logging
 import os
-import queue
-import random
 import sys
-import threading
 import time
-from typing import Any, Dict, AsyncGenerator
+from typing import Any, AsyncGenerator
 
 from confz import EnvSource
 from dotenv import load_dotenv
@@ -35,49 +31,6 @@ def clamp(n: float | int, smallest: float | int, largest: float | int):
     return max(smallest, min(n, largest))
 
 
-class RandomAsyncIterator:
-    """Manages multiple async iterables and allows iterating over them in a random order."""
-
-    def __init__(self, async_iterables):
-        # Convert each iterable into an async iterator
-        self.async_iterators = [ai.__aiter__() for ai in async_iterables]
-
-    def __aiter__(self):
-        return self
-
-    async def __anext__(self):
-        """Return the next item from a randomly chosen iterator. If all iterators are exhausted, stop iteration."""
-        if not self.async_iterators:  # Check if there are no iterators left
-            raise StopAsyncIteration
-
-        # Select a random iterator from the list
-        random_index = random.randint(0, len(self.async_iterators) - 1)
-        try:
-            # Attempt to get the next item from the randomly selected iterator
-            return await self.async_iterators[random_index].__anext__()
-        except StopAsyncIteration:
-            # If the selected iterator is exhausted, remove it from the list
-            del self.async_iterators[random_index]
-
-        # If all iterators are exhausted, raise StopAsyncIteration
-        raise StopAsyncIteration
-
-    def is_empty(self):
-        """Check if there are any iterators left."""
-        return len(self.async_iterators) <= 0
-
-    def add_iterator(self, async_iterable):
-        """Add a new async iterable to the pool of iterators."""
-        self.async_iterators.append(async_iterable.__aiter__())
-
-    def remove_iterator(self, async_iterable):
-        """Attempt to remove an async iterable from the pool if it exists."""
-        try:
-            self.async_iterators.remove(async_iterable.__aiter__())
-        except ValueError:
-            pass  # If the iterable is not found, ignore the error
-
-
 def get_backend_configs():
     # Manually load env var as ConfZ does not handle complex types (list)
     stop_tokens: str | None = os.getenv("LAI_STOP_TOKENS")
@@ -134,20 +87,11 @@ def get_config_from_request(request: ChatCompletionRequest | CompletionRequest):
 
 @LLM
 class Model:
-    """Implements an LLM model with concurrent output generation and management."""
-
-    done_by_id: Dict[str, bool] = {}
-    delta_queue_by_id: Dict[str, queue.Queue] = {}
-    result_by_id: Dict[str, RequestOutput] = {}
-    random_iterator: RandomAsyncIterator = RandomAsyncIterator([])
+    """Implements an LLM model that streams vLLM engine outputs on the server's event loop."""
 
     def __init__(self):
         logging.getLogger().setLevel(logging.DEBUG)
 
-        # Background thread for managing output iteration
-        _thread = threading.Thread(target=asyncio.run, args=(self.iterate_outputs(),))
-        _thread.start()
-
         self.backend_config = get_backend_configs()
         self.model = self.backend_config.model.source
         self.engine_args = AsyncEngineArgs(
@@ -162,65 +106,13 @@ class Model:
             gpu_memory_utilization=0.90,
             tensor_parallel_size=AppConfig().backend_options.tensor_parallel_size,
         )
+        # The engine's background loop is started on the first call to generate, so it runs on the
+        # same event loop as the gRPC server
         self.engine = AsyncLLMEngine.from_engine_args(self.engine_args)
         print(self.engine_args)
 
-    async def iterate_outputs(self):
-        """Continuously processes outputs from the random iterator and manages state by request IDs."""
-
-        t0_by_id: dict[str, float] = {}
-        index_by_id: dict[str, int] = {}
-        num_tokens_by_id: dict[str, int] = {}
-
-        while True:
-            if not self.random_iterator.is_empty():
-                request_output: RequestOutput
-                async for request_output in self.random_iterator:
-                    request_id = request_output.request_id
-
-                    if request_output.finished:
-                        # Signal that the "generate" function can stop waiting for additional inputs
-                        logging.info(
-                            f"Generated {num_tokens_by_id[request_id]} tokens in {time.time() - t0_by_id[request_id]:.2f}s"
-                        )
-                        self.done_by_id[request_id] = True
-                    else:
-                        # Initialize dictionary entries
-                        if t0_by_id.get(request_id) is None:
-                            t0_by_id[request_id] = time.time()
-
-                        if index_by_id.get(request_id) is None:
-                            index_by_id[request_id] = 0
-
-                        if num_tokens_by_id.get(request_id) is None:
-                            num_tokens_by_id[request_id] = 0
-
-                    if (
-                        request_output.outputs[0].text
-                        and "\ufffd" == request_output.outputs[0].text[-1]
-                    ):
-                        continue
-
-                    # Update tracking information
-                    text_delta = request_output.outputs[0].text[
-                        index_by_id[request_id] :
-                    ]
-                    index_by_id[request_id] = len(request_output.outputs[0].text)
-                    num_tokens_by_id[request_id] = len(
-                        request_output.outputs[0].token_ids
-                    )
-
-                    # Add the result to the queue for this request
-                    self.delta_queue_by_id[request_id].put(text_delta)
-            time.sleep(0)
-
-    async def create_response(
-        self, request_id: str, prompt: str, config: GenerationConfig
-    ):
-        """Initiate a response generation for the given prompt and configuration, adding the result to the iterator
-        pool."""
-
-        sampling_params = SamplingParams(
+    def get_sampling_params(self, config: GenerationConfig) -> SamplingParams:
+        return SamplingParams(
             temperature=config.temperature,
             # Clamp top_p value to prevent float errors
             top_p=clamp(config.top_p, 0.0 + sys.float_info.epsilon, 1.0),
@@ -230,59 +122,59 @@ class Model:
             max_tokens=config.max_new_tokens,
             skip_special_tokens=False,
         )
-        logging.debug(sampling_params)
-        logging.info(f"Begin generation for request {request_id}")
-        # Generate texts from the prompts. The output is a list of RequestOutput objects
-        # that contain the prompt, generated text, and other information.
-        gen_iter = self.engine.generate(prompt, sampling_params, request_id)
-        logging.info(f"Begin iteration for request {request_id}")
-        self.random_iterator.add_iterator(gen_iter)
-
-    async def generate_session(
-        self, session: str, prompt: str, config: GenerationConfig
-    ):
-        """Manage a session's lifecycle for generating output, including setting up necessary state and iterators."""
-
-        if self.delta_queue_by_id.get(session) is None:
-            self.delta_queue_by_id[session] = queue.Queue()
-
-        await self.create_response(session, prompt, config)
-
-    def is_queue_empty(self, request_id) -> bool:
-        """Check if the queue for a given request ID is empty or non-existent."""
-
-        cur_request_queue = self.delta_queue_by_id.get(request_id)
-        return cur_request_queue is None or cur_request_queue.empty()
 
     async def generate(
         self, prompt: str, config: GenerationConfig
     ) -> AsyncGenerator[str, Any]:
-        """Initiate and manage the generation process for a given prompt, yielding generated text segments."""
+        """Stream the text generated for a prompt, yielding only the new text of each engine output."""
 
         request_id = random_uuid()
-        self.done_by_id[request_id] = False
-
-        # Spawns a thread to request a response for the prompt
-        _thread = threading.Thread(
-            target=asyncio.run,
-            args=(self.generate_session(request_id, prompt, config),),
-        )
-        _thread.start()
+        sampling_params = self.get_sampling_params(config)
+        logging.debug(sampling_params)
+        logging.info(f"Begin generation for request {request_id}")
 
-        logging.info(f"Begin reading the output for request {request_id}")
+        t0 = time.time()
+        index = 0
+        num_tokens = 0
 
-        while not self.done_by_id.get(request_id) or not self.is_queue_empty(
-            request_id
-        ):
-            result = ""
-            if not self.is_queue_empty(request_id):
-                result = self.delta_queue_by_id.get(request_id).get()
-            yield result
+        finished = False
 
-        logging.info(f"Finished request {request_id}")
+        try:
+            request_output: RequestOutput
+            async for request_output in self.engine.generate(
+                prompt, sampling_params, request_id
+            ):
+                output = request_output.outputs[0]
+                finished = request_output.finished
+
+                # Wait for the rest of a multi-byte character before emitting it
+                if output.text and "\ufffd" == output.text[-1]:
+                    continue
+
+                text_delta = output.text[index:]
+                index = len(output.text)
+                num_tokens = len(output.token_ids)
+
+                if text_delta:
+                    yield text_delta
+        finally:
+            # The generator is closed early when the client cancels the RPC, so free the
+            # request's sequence slots and KV cache instead of generating into the void
+            if not finished:
+                logging.info(f"Aborting cancelled request {request_id}")
+                await self.engine.abort(request_id)
+
+        logging.info(
+            f"Generated {num_tokens} tokens in {time.time() - t0:.2f}s for request {request_id}"
+        )
 
     async def count_tokens(self, raw_text: str) -> int:
         tokens: list[int] | list[str] = (await self.engine.get_tokenizer()).tokenize(
             raw_text
         )
         return len(tokens)
+
+    async def tokenize(self, raw_text: str) -> list[int]:
+        return (await self.engine.get_tokenizer()).encode(
+            raw_text, add_special_tokens=False
+        )
@@ -2,6 +2,7 @@ import asyncio
 import logging
 import os
 import tempfile
+import threading
 from typing import Iterator
 
 import leapfrogai_sdk as lfai
@@ -13,11 +14,26 @@ model_path = os.environ.get("LFAI_MODEL_PATH", ".model")
 
 GPU_ENABLED = True if int(os.environ.get("GPU_REQUEST", 0)) > 0 else False
 
+COMPUTE_TYPE = os.environ.get("LFAI_COMPUTE_TYPE", "float32")
+# 0 lets CTranslate2 pick the number of threads
+CPU_THREADS = int(os.environ.get("LFAI_CPU_THREADS", 0))
+# Number of transcriptions that can run in parallel on the loaded model
+NUM_WORKERS = max(int(os.environ.get("LFAI_NUM_WORKERS", 1)), 1)
+
+# The model is loaded once and shared by every request, CTranslate2 keeps one replica per worker
+model = WhisperModel(
+    model_path,
+    device="cuda" if GPU_ENABLED else "cpu",
+    compute_type=COMPUTE_TYPE,
+    cpu_threads=CPU_THREADS,
+    num_workers=NUM_WORKERS,
+)
+
+# Requests beyond the number of model workers wait here instead of contending for the model
+worker_slots = threading.BoundedSemaphore(NUM_WORKERS)
 
-def make_transcribe_request(filename, task, language, temperature, prompt):
-    device = "cuda" if GPU_ENABLED else "cpu"
-    model = WhisperModel(model_path, device=device, compute_type="float32")
 
+def make_transcribe_request(filename, task, language, temperature, prompt):
     # Prepare kwargs with non-None values
     kwargs = {}
     if task:
@@ -36,16 +52,18 @@ def make_transcribe_request(filename, task, language, temperature, prompt):
     if prompt:
         kwargs["initial_prompt"] = prompt
 
-    try:
-        # Call transcribe with only non-None parameters
-        segments, info = model.transcribe(filename, beam_size=5, **kwargs)
-    except Exception as e:
-        logger.error(f"Error transcribing audio: {e}")
-        return {"text": ""}
+    with worker_slots:
+        try:
+            # Call transcribe with only non-None parameters
+            segments, info = model.transcribe(filename, beam_size=5, **kwargs)
+        except Exception as e:
+            logger.error(f"Error transcribing audio: {e}")
+            return {"text": ""}
 
-    output = ""
-    for segment in segments:
-        output += segment.text
+        # Segments are generated lazily, so decoding happens while iterating
+        output = ""
+        for segment in segments:
+            output += segment.text
 
     logger.info("Completed " + filename)
 
@@ -109,6 +127,7 @@ class Whisper(lfai.AudioServicer):
 async def main():
     logging.basicConfig(level=logging.INFO)
     logger.info(f"GPU_ENABLED = {GPU_ENABLED}")
+    logger.info(f"COMPUTE_TYPE = {COMPUTE_TYPE}, NUM_WORKERS = {NUM_WORKERS}")
     await lfai.serve(Whisper())
 
 
@@ -1,5 +1,7 @@
 """gRPC client for OpenAI models."""
 
+import os
+from collections import OrderedDict
 from typing import Iterator, AsyncGenerator, Any
 import grpc
 from fastapi.responses import StreamingResponse
@@ -20,132 +22,185 @@ from leapfrogai_api.backend.types import (
 from leapfrogai_sdk.chat.chat_pb2 import (
     ChatCompletionResponse as ProtobufChatCompletionResponse,
 )
+from leapfrogai_api.utils.cache_key import cache_key
+from leapfrogai_api.utils.channel_pool import get_channel_pool
 from leapfrogai_api.utils.config import Model
 
+# A text always has the same number of tokens for a model, so counts are kept in an LRU
+# keyed by a hash of (model, text)
+TOKEN_COUNTS_CACHE_SIZE = int(os.getenv("LFAI_TOKEN_COUNTS_CACHE_SIZE", 10000))
+token_counts_cache: OrderedDict[str, int] = OrderedDict()
+
 
 async def stream_completion(model: Model, request: lfai.CompletionRequest):
     """Stream completion using the specified model."""
-    async with grpc.aio.insecure_channel(model.backend) as channel:
-        stub = lfai.CompletionStreamServiceStub(channel)
-        stream = stub.CompleteStream(request)
+    channel = get_channel_pool().get(model.backend)
+    stub = lfai.CompletionStreamServiceStub(channel)
+    stream = stub.CompleteStream(request)
 
-        await stream.wait_for_connection()
-        return StreamingResponse(
-            recv_completion(stream, model.name), media_type="text/event-stream"
-        )
+    await stream.wait_for_connection()
+    return StreamingResponse(
+        recv_completion(stream, model.name), media_type="text/event-stream"
+    )
 
 
 # TODO: Clean up completion() and stream_completion() to reduce code duplication
 async def completion(model: Model, request: lfai.CompletionRequest):
     """Complete using the specified model."""
-    async with grpc.aio.insecure_channel(model.backend) as channel:
-        stub = lfai.CompletionServiceStub(channel)
-        response: lfai.CompletionResponse = await stub.Complete(request)
-
-        return CompletionResponse(
-            model=model.name,
-            choices=[
-                CompletionChoice(
-                    index=0,
-                    text=response.choices[0].text,
-                    finish_reason=str(response.choices[0].finish_reason),
-                    logprobs=None,
-                )
-            ],
-            usage=Usage(
-                prompt_tokens=response.usage.prompt_tokens,
-                completion_tokens=response.usage.completion_tokens,
-                total_tokens=response.usage.total_tokens,
-            ),
-        )
+    channel = get_channel_pool().get(model.backend)
+    stub = lfai.CompletionServiceStub(channel)
+    response: lfai.CompletionResponse = await stub.Complete(request)
+
+    return CompletionResponse(
+        model=model.name,
+        choices=[
+            CompletionChoice(
+                index=0,
+                text=response.choices[0].text,
+                finish_reason=str(response.choices[0].finish_reason),
+                logprobs=None,
+            )
+        ],
+        usage=Usage(
+            prompt_tokens=response.usage.prompt_tokens,
+            completion_tokens=response.usage.completion_tokens,
+            total_tokens=response.usage.total_tokens,
+        ),
+    )
 
 
 async def stream_chat_completion(model: Model, request: lfai.ChatCompletionRequest):
     """Stream chat completion using the specified model."""
-    async with grpc.aio.insecure_channel(model.backend) as channel:
-        stub = lfai.ChatCompletionStreamServiceStub(channel)
-        stream = stub.ChatCompleteStream(request)
+    channel = get_channel_pool().get(model.backend)
+    stub = lfai.ChatCompletionStreamServiceStub(channel)
+    stream = stub.ChatCompleteStream(request)
 
-        await stream.wait_for_connection()
-        return StreamingResponse(
-            recv_chat(stream, model.name), media_type="text/event-stream"
-        )
+    await stream.wait_for_connection()
+    return StreamingResponse(
+        recv_chat(stream, model.name), media_type="text/event-stream"
+    )
 
 
 async def stream_chat_completion_raw(
     model: Model, request: lfai.ChatCompletionRequest
 ) -> AsyncGenerator[ProtobufChatCompletionResponse, Any]:
     """Stream chat completion using the specified model."""
-    async with grpc.aio.insecure_channel(model.backend) as channel:
-        stub = lfai.ChatCompletionStreamServiceStub(channel)
-        stream: grpc.aio.UnaryStreamCall[
-            lfai.ChatCompletionRequest, lfai.ChatCompletionResponse
-        ] = stub.ChatCompleteStream(request)
+    channel = get_channel_pool().get(model.backend)
+    stub = lfai.ChatCompletionStreamServiceStub(channel)
+    stream: grpc.aio.UnaryStreamCall[
+        lfai.ChatCompletionRequest, lfai.ChatCompletionResponse
+    ] = stub.ChatCompleteStream(request)
 
+    try:
         await stream.wait_for_connection()
 
         async for response in stream:
             yield response
+    finally:
+        # Cancels the backend's generation if the consumer stopped reading early
+        stream.cancel()
 
 
 # TODO: Clean up completion() and stream_completion() to reduce code duplication
 async def chat_completion(model: Model, request: lfai.ChatCompletionRequest):
     """Complete chat using the specified model."""
-    async with grpc.aio.insecure_channel(model.backend) as channel:
-        stub = lfai.ChatCompletionServiceStub(channel)
-        response: lfai.ChatCompletionResponse = await stub.ChatComplete(request)
-        return ChatCompletionResponse(
-            model=model.name,
-            choices=[
-                ChatChoice(
-                    index=0,
-                    message=ChatMessage(
-                        role=lfai.ChatRole.Name(
-                            response.choices[0].chat_item.role
-                        ).lower(),
-                        content=response.choices[0].chat_item.content,
-                    ),
-                    finish_reason=response.choices[0].finish_reason,
-                )
-            ],
-            usage=Usage(
-                prompt_tokens=response.usage.prompt_tokens,
-                completion_tokens=response.usage.completion_tokens,
-                total_tokens=response.usage.total_tokens,
-            ),
-        )
+    channel = get_channel_pool().get(model.backend)
+    stub = lfai.ChatCompletionServiceStub(channel)
+    response: lfai.ChatCompletionResponse = await stub.ChatComplete(request)
+    return ChatCompletionResponse(
+        model=model.name,
+        choices=[
+            ChatChoice(
+                index=0,
+                message=ChatMessage(
+                    role=lfai.ChatRole.Name(response.choices[0].chat_item.role).lower(),
+                    content=response.choices[0].chat_item.content,
+                ),
+                finish_reason=response.choices[0].finish_reason,
+            )
+        ],
+        usage=Usage(
+            prompt_tokens=response.usage.prompt_tokens,
+            completion_tokens=response.usage.completion_tokens,
+            total_tokens=response.usage.total_tokens,
+        ),
+    )
 
 
 async def create_embeddings(model: Model, request: lfai.EmbeddingRequest):
     """Create embeddings using the specified model."""
-    async with grpc.aio.insecure_channel(model.backend) as channel:
-        stub = lfai.EmbeddingsServiceStub(channel)
-        e: lfai.EmbeddingResponse = await stub.CreateEmbedding(request)
-        return CreateEmbeddingResponse(
-            data=[
-                EmbeddingResponseData(
-                    embedding=list(e.embeddings[i].embedding), index=i
-                )
-                for i in range(len(e.embeddings))
-            ],
-            model=model.name,
-            usage=Usage(prompt_tokens=0, total_tokens=0),
+    channel = get_channel_pool().get(model.backend)
+    stub = lfai.EmbeddingsServiceStub(channel)
+    e: lfai.EmbeddingResponse = await stub.CreateEmbedding(request)
+    return CreateEmbeddingResponse(
+        data=[
+            EmbeddingResponseData(embedding=list(e.embeddings[i].embedding), index=i)
+            for i in range(len(e.embeddings))
+        ],
+        model=model.name,
+        usage=Usage(prompt_tokens=0, total_tokens=0),
+    )
+
+
+async def rerank(model: Model, request: lfai.RerankRequest) -> list[float]:
+    """Score documents on their relevance to a query using the specified model."""
+    channel = get_channel_pool().get(model.backend)
+    stub = lfai.RerankServiceStub(channel)
+    response: lfai.RerankResponse = await stub.Rerank(request)
+
+    return list(response.scores)
+
+
+async def count_tokens(model: Model, texts: list[str]) -> list[int]:
+    """Count the tokens in each text with the specified model's tokenizer."""
+    keys = [cache_key(model.name, text) for text in texts]
+
+    # Copied out before awaiting, other calls may evict these keys while the RPC is in flight
+    known = {key: token_counts_cache[key] for key in keys if key in token_counts_cache}
+    uncached = {key: text for key, text in zip(keys, texts) if key not in known}
+    if uncached:
+        channel = get_channel_pool().get(model.backend)
+        stub = lfai.TokenizeServiceStub(channel)
+        response: lfai.CountTokensResponse = await stub.CountTokens(
+            lfai.TokenizeRequest(texts=list(uncached.values()))
         )
+        known.update(zip(uncached, response.counts))
+        token_counts_cache.update(zip(uncached, response.counts))
+
+    for key in known:
+        if key in token_counts_cache:
+            token_counts_cache.move_to_end(key)
+
+    while len(token_counts_cache) > TOKEN_COUNTS_CACHE_SIZE:
+        token_counts_cache.popitem(last=False)
+
+    return [known[key] for key in keys]
+
+
+async def tokenize(model: Model, texts: list[str]) -> list[list[int]]:
+    """Turn each text into token ids with the specified model's tokenizer."""
+    channel = get_channel_pool().get(model.backend)
+    stub = lfai.TokenizeServiceStub(channel)
+    response: lfai.TokenizeResponse = await stub.Tokenize(
+        lfai.TokenizeRequest(texts=texts)
+    )
+
+    return [list(tokens.ids) for tokens in response.tokens]
 
 
 async def create_transcription(model: Model, request: Iterator[lfai.AudioRequest]):
     """Transcribe audio using the specified model."""
-    async with grpc.aio.insecure_channel(model.backend) as channel:
-        stub = lfai.AudioStub(channel)
-        response: lfai.AudioResponse = await stub.Transcribe(request)
+    channel = get_channel_pool().get(model.backend)
+    stub = lfai.AudioStub(channel)
+    response: lfai.AudioResponse = await stub.Transcribe(request)
 
-        return CreateTranscriptionResponse(text=response.text)
+    return CreateTranscriptionResponse(text=response.text)
 
 
 async def create_translation(model: Model, request: Iterator[lfai.AudioRequest]):
     """Translate audio using the specified model."""
-    async with grpc.aio.insecure_channel(model.backend) as channel:
-        stub = lfai.AudioStub(channel)
-        response: lfai.AudioResponse = await stub.Translate(request)
+    channel = get_channel_pool().get(model.backend)
+    stub = lfai.AudioStub(channel)
+    response: lfai.AudioResponse = await stub.Translate(request)
 
-        return CreateTranslationResponse(text=response.text)
+    return CreateTranslationResponse(text=response.text)
@@ -19,32 +19,36 @@ async def recv_completion(
     stream: grpc.aio.UnaryStreamCall[lfai.CompletionRequest, lfai.CompletionResponse],
     model: str,
 ):
-    async for c in stream:
-        yield (
-            "data: "
-            + CompletionResponse(
-                id=str(uuid.uuid4()),
-                object="completion.chunk",
-                created=int(time.time()),
-                model=model,
-                choices=[
-                    CompletionChoice(
-                        index=0,
-                        text=c.choices[0].text,
-                        logprobs=None,
-                        finish_reason=c.choices[0].finish_reason,
-                    )
-                ],
-                usage=Usage(
-                    prompt_tokens=c.usage.prompt_tokens,
-                    completion_tokens=c.usage.completion_tokens,
-                    total_tokens=c.usage.total_tokens,
-                ),
-            ).model_dump_json()
-        )
-        yield "\n\n"
+    try:
+        async for c in stream:
+            yield (
+                "data: "
+                + CompletionResponse(
+                    id=str(uuid.uuid4()),
+                    object="completion.chunk",
+                    created=int(time.time()),
+                    model=model,
+                    choices=[
+                        CompletionChoice(
+                            index=0,
+                            text=c.choices[0].text,
+                            logprobs=None,
+                            finish_reason=c.choices[0].finish_reason,
+                        )
+                    ],
+                    usage=Usage(
+                        prompt_tokens=c.usage.prompt_tokens,
+                        completion_tokens=c.usage.completion_tokens,
+                        total_tokens=c.usage.total_tokens,
+                    ),
+                ).model_dump_json()
+            )
+            yield "\n\n"
 
-    yield "data: [DONE]"
+        yield "data: [DONE]"
+    finally:
+        # Cancels the backend's generation if the client disconnected mid-stream
+        stream.cancel()
 
 
 async def recv_chat(
@@ -54,33 +58,37 @@ async def recv_chat(
     model: str,
 ) -> AsyncGenerator[str, Any]:
     """Generator that yields chat completion responses as Server-Sent Events."""
-    async for c in stream:
-        yield (
-            "data: "
-            + ChatCompletionResponse(
-                id=str(uuid.uuid4()),
-                object="chat.completion.chunk",
-                created=int(time.time()),
-                model=model,
-                choices=[
-                    ChatStreamChoice(
-                        index=0,
-                        delta=ChatDelta(
-                            role="assistant", content=c.choices[0].chat_item.content
-                        ),
-                        finish_reason=c.choices[0].finish_reason,
-                    )
-                ],
-                usage=Usage(
-                    prompt_tokens=c.usage.prompt_tokens,
-                    completion_tokens=c.usage.completion_tokens,
-                    total_tokens=c.usage.total_tokens,
-                ),
-            ).model_dump_json()
-        )
-        yield "\n\n"
+    try:
+        async for c in stream:
+            yield (
+                "data: "
+                + ChatCompletionResponse(
+                    id=str(uuid.uuid4()),
+                    object="chat.completion.chunk",
+                    created=int(time.time()),
+                    model=model,
+                    choices=[
+                        ChatStreamChoice(
+                            index=0,
+                            delta=ChatDelta(
+                                role="assistant", content=c.choices[0].chat_item.content
+                            ),
+                            finish_reason=c.choices[0].finish_reason,
+                        )
+                    ],
+                    usage=Usage(
+                        prompt_tokens=c.usage.prompt_tokens,
+                        completion_tokens=c.usage.completion_tokens,
+                        total_tokens=c.usage.total_tokens,
+                    ),
+                ).model_dump_json()
+            )
+            yield "\n\n"
 
-    yield "data: [DONE]\n\n"
+        yield "data: [DONE]\n\n"
+    finally:
+        # Cancels the backend's generation if the client disconnected mid-stream
+        stream.cancel()
 
 
 def grpc_chat_role(role: str) -> lfai.ChatRole:
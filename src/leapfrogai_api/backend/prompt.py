@@ -0,0 +1,115 @@
+"""Fitting chat prompts into a token budget."""
+
+import logging
+import os
+import time
+
+import grpc
+from openai.types.beta.threads.run_create_params import TruncationStrategy
+
+from leapfrogai_api.backend import grpc_client
+from leapfrogai_api.backend.rag.document_loader import count_tokens
+from leapfrogai_api.backend.types import ChatMessage
+from leapfrogai_api.utils import get_model_config
+
+# Share of the prompt budget set aside for RAG context, any of it left unused goes to the thread
+RAG_CONTEXT_SHARE = float(os.getenv("LFAI_RAG_CONTEXT_SHARE", 0.25))
+# Tokens a chat template adds around each message for its role and separators
+MESSAGE_TOKEN_OVERHEAD = int(os.getenv("LFAI_MESSAGE_TOKEN_OVERHEAD", 4))
+# Seconds before a model whose backend didn't serve TokenizeService is asked again, in case the
+# backend has since been upgraded or the request reached a replica that was mid-rollout
+TOKENIZE_RETRY_INTERVAL = float(os.getenv("LFAI_TOKENIZE_RETRY_INTERVAL", 300))
+
+
+def message_text(message: ChatMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(block["text"] for block in message.content)
+
+
+# Models whose backends don't serve TokenizeService, and when they may be asked again
+_untokenizable_models: dict[str, float] = {}
+
+
+async def count_message_tokens(model: str, messages: list[ChatMessage]) -> list[int]:
+    """Number of tokens each message takes up in the model's prompt.
+
+    The model's own tokenizer does the counting, through its backend's TokenizeService. When
+    that isn't available, the counts are estimated with the embeddings tokenizer.
+    """
+    if not messages:
+        return []
+
+    texts = [message_text(message) for message in messages]
+    counts: list[int] | None = None
+
+    # Any replica's tokenizer will do, so this skips get_model_backend's replica routing
+    model_config = get_model_config().models.get(model)
+    if model_config and _untokenizable_models.get(model, 0) <= time.monotonic():
+        try:
+            counts = await grpc_client.count_tokens(model_config, texts)
+        except grpc.aio.AioRpcError as exc:
+            # Other errors may be transient, so only a missing service is remembered
+            if exc.code() == grpc.StatusCode.UNIMPLEMENTED:
+                _untokenizable_models[model] = (
+                    time.monotonic() + TOKENIZE_RETRY_INTERVAL
+                )
+            logging.warning(
+                "Unable to count tokens with %s, estimating them instead: %s",
+                model,
+                exc.details(),
+            )
+        except Exception:
+            # Token counts only size the prompt, they shouldn't fail the run
+            logging.exception(
+                "Unable to count tokens with %s, estimating them instead", model
+            )
+
+    if counts is None:
+        counts = [count_tokens(text) for text in texts]
+
+    return [count + MESSAGE_TOKEN_OVERHEAD for count in counts]
+
+
+def truncate_messages(
+    messages: list[ChatMessage],
+    token_counts: list[int],
+    max_tokens: int,
+    truncation_strategy: TruncationStrategy | None = None,
+) -> list[ChatMessage]:
+    """Keep the most recent messages that fit in max_tokens.
+
+    With a last_messages truncation strategy, no more than that many messages are kept. The
+    latest message is always kept, even when it doesn't fit on its own.
+    """
+    if not messages:
+        return []
+
+    limit = len(messages)
+    if (
+        truncation_strategy
+        and truncation_strategy["type"] == "last_messages"
+        and truncation_strategy.get("last_messages")
+    ):
+        limit = min(limit, truncation_strategy["last_messages"])
+
+    kept = 1
+    tokens = token_counts[-1]
+    # Walk back from the latest message, stopping at the first one that doesn't fit so the
+    # thread stays contiguous
+    while kept < limit and tokens + token_counts[-kept - 1] <= max_tokens:
+        tokens += token_counts[-kept - 1]
+        kept += 1
+
+    if tokens > max_tokens:
+        logging.warning(
+            "The latest message alone takes %s tokens, past the prompt budget of %s",
+            tokens,
+            max_tokens,
+        )
+    if kept < len(messages):
+        logging.debug(
+            "Truncated the thread to its last %s of %s messages", kept, len(messages)
+        )
+
+    return messages[-kept:]
@@ -1,5 +1,20 @@
 """Load a file and split it into chunks."""
 
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import queue
+import resource
+import signal
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.managers import SyncManager
+from threading import Event
+from typing import AsyncIterator, BinaryIO
+
 # This import is required for "magic" to work, see https://github.com/ahupp/python-magic/issues/233
 # may not be needed after https://github.com/ahupp/python-magic/pull/294 is merged
 import pylibmagic  # noqa: F401 # pylint: disable=unused-import
@@ -14,8 +29,40 @@ from langchain_community.document_loaders import (
     UnstructuredPowerPointLoader,
     UnstructuredExcelLoader,
 )
+from langchain_core.document_loaders import BaseLoader
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from openai.types.beta.vector_stores.vector_store_file import (
+    ChunkingStrategyStatic,
+    ChunkingStrategyStaticStatic,
+)
+from tokenizers import Tokenizer
+
+
+# How much of a file is read to detect its MIME type
+SNIFF_BYTES = 8192
+
+# How many chunks a parser worker sends at once, and how many of those sends may be waiting
+# for the API before the worker pauses
+PARSER_BATCH_SIZE = 32
+PARSER_QUEUE_SIZE = 4
+# How often a waiting parser worker or API task checks whether the other side has gone away
+PARSER_POLL_INTERVAL = 0.5
+
+# Chunk sizes for the "auto" chunking strategy, in tokens of the embeddings model. These keep
+# chunks within the 512 token input of the default instructor-xl embeddings model.
+DEFAULT_CHUNK_SIZE_TOKENS = int(os.environ.get("LFAI_CHUNK_SIZE_TOKENS", 400))
+DEFAULT_CHUNK_OVERLAP_TOKENS = int(os.environ.get("LFAI_CHUNK_OVERLAP_TOKENS", 50))
+
+# The embeddings model's tokenizer.json, bundled into the API image alongside the API
+EMBEDDINGS_TOKENIZER = os.environ.get(
+    "LFAI_EMBEDDINGS_TOKENIZER", "/leapfrogai/tokenizers/text-embeddings/tokenizer.json"
+)
+
+
+class DocumentParsingError(Exception):
+    """Raised when a file can't be loaded or split into chunks."""
+
 
 HANDLERS = {
     "application/pdf": PyPDFLoader,
@@ -61,20 +108,332 @@ def is_supported_mime_type(mime_type: str) -> bool:
     return mime_type in HANDLERS
 
 
+class DocumentParser:
+    """Parses files in a pool of worker processes, keeping CPU-heavy extraction off the API.
+
+    Each parse runs under a time limit and, optionally, a per-process memory limit. Workers
+    load a file one document (e.g. one PDF page) at a time and send its chunks back through a
+    bounded queue as plain (page_content, metadata) pairs, so a worker waits for the API to
+    catch up rather than holding the whole file's chunks in memory.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        timeout: float,
+        memory_limit_mb: int = 0,
+        handlers: dict[str, type[BaseLoader]] = HANDLERS,
+    ):
+        self.max_workers = max(max_workers, 1)
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.handlers = handlers
+        self._executor: ProcessPoolExecutor | None = None
+        self._manager: SyncManager | None = None
+
+    @classmethod
+    def from_env(cls) -> "DocumentParser":
+        """Build a parser using the LFAI_PARSER_* environment variables."""
+        return cls(
+            max_workers=int(
+                os.environ.get("LFAI_PARSER_WORKERS", min(4, os.cpu_count() or 1))
+            ),
+            timeout=float(os.environ.get("LFAI_PARSER_TIMEOUT", 300)),
+            memory_limit_mb=int(os.environ.get("LFAI_PARSER_MEMORY_LIMIT_MB", 0)),
+        )
+
+    async def parse(
+        self,
+        file_path: str,
+        mime_type: str,
+        chunk_sizes: tuple[int, int] | None = None,
+    ) -> list[Document]:
+        """Load a whole file in a worker process.
+
+        If chunk_sizes, a (max_chunk_size_tokens, chunk_overlap_tokens) pair, is given the file
+        is also split into chunks of that size.
+        """
+        return [
+            document
+            async for document in self.stream(file_path, mime_type, chunk_sizes)
+        ]
+
+    async def stream(
+        self,
+        file_path: str,
+        mime_type: str,
+        chunk_sizes: tuple[int, int] | None = None,
+    ) -> AsyncIterator[Document]:
+        """Load a file in a worker process, yielding its documents as the worker produces them.
+
+        If chunk_sizes, a (max_chunk_size_tokens, chunk_overlap_tokens) pair, is given the file
+        is also split into chunks of that size.
+        """
+
+        if mime_type not in self.handlers:
+            raise DocumentParsingError(f"Unsupported file type: {mime_type}")
+
+        if self._manager is None:
+            # The manager's queues can be handed to pool workers, unlike multiprocessing.Queue
+            self._manager = await asyncio.to_thread(
+                multiprocessing.get_context("spawn").Manager
+            )
+        if self._executor is None:
+            # Spawned workers don't inherit the API's event loop and threads like forked ones would
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb,),
+            )
+
+        chunks = await asyncio.to_thread(self._manager.Queue, PARSER_QUEUE_SIZE)
+        cancelled = await asyncio.to_thread(self._manager.Event)
+        future = None
+        try:
+            future = asyncio.wrap_future(
+                self._executor.submit(
+                    _parse_in_worker,
+                    self.handlers[mime_type],
+                    file_path,
+                    chunk_sizes,
+                    self.timeout,
+                    chunks,
+                    cancelled,
+                )
+            )
+            while (batch := await self._receive(chunks, future)) is not None:
+                for page_content, metadata in batch:
+                    yield Document(page_content=page_content, metadata=metadata)
+        except BrokenProcessPool as exc:
+            # A worker died (e.g. killed for running out of memory), start over with a new pool
+            self._executor = None
+            raise DocumentParsingError(f"Parser crashed on {file_path}") from exc
+        except Exception as exc:
+            raise DocumentParsingError(f"Unable to parse {file_path}") from exc
+        finally:
+            if future is not None and not future.done():
+                # The caller stopped early, let the worker give up instead of waiting on the queue
+                await asyncio.to_thread(cancelled.set)
+
+    async def _receive(
+        self, chunks: queue.Queue, future: asyncio.Future
+    ) -> list[tuple[str, dict]] | None:
+        """Wait for the worker's next batch of documents, or None once it's done."""
+
+        loop = asyncio.get_running_loop()
+        # The worker enforces the timeout itself, this only guards against a stuck worker
+        deadline = loop.time() + self.timeout + 30
+
+        while True:
+            try:
+                return await asyncio.to_thread(chunks.get, timeout=PARSER_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+
+            if future.done():
+                # Everything the worker sent is queued by the time its job finishes
+                try:
+                    return chunks.get_nowait()
+                except queue.Empty:
+                    future.result()
+                    return None
+
+            if loop.time() > deadline:
+                raise TimeoutError("Parser stopped responding")
+
+
+class _ParsingCancelled(Exception):
+    """Raised in a worker when the API no longer wants the file it's parsing."""
+
+
+def _init_worker(memory_limit_mb: int):
+    if memory_limit_mb > 0:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _raise_timeout(_signum, _frame):
+    raise TimeoutError("Parsing took too long")
+
+
+def _send(chunks: queue.Queue, cancelled: Event, batch: list[tuple[str, dict]]):
+    """Queue a batch of documents for the API, pausing the parse timeout while the queue is full."""
+
+    remaining, _ = signal.setitimer(signal.ITIMER_REAL, 0)
+    try:
+        while True:
+            try:
+                chunks.put(batch, timeout=PARSER_POLL_INTERVAL)
+                return
+            except queue.Full:
+                if cancelled.is_set():
+                    raise _ParsingCancelled()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, remaining)
+
+
+def _parse_in_worker(
+    loader: type[BaseLoader],
+    file_path: str,
+    chunk_sizes: tuple[int, int] | None,
+    timeout: float,
+    chunks: queue.Queue,
+    cancelled: Event,
+):
+    """Runs in a worker process: load (and split) a file one document at a time, sending the
+    results to `chunks` and giving up after `timeout` seconds of parsing."""
+
+    splitter = _text_splitter(*chunk_sizes) if chunk_sizes else None
+
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        for document in loader(file_path).lazy_load():
+            documents = splitter.split_documents([document]) if splitter else [document]
+            for i in range(0, len(documents), PARSER_BATCH_SIZE):
+                _send(
+                    chunks,
+                    cancelled,
+                    [
+                        (d.page_content, d.metadata)
+                        for d in documents[i : i + PARSER_BATCH_SIZE]
+                    ],
+                )
+    except _ParsingCancelled:
+        return
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+document_parser = DocumentParser.from_env()
+
+
+class InMemoryFile:
+    """A writable file held in memory that worker processes can still open by path.
+
+    The loaders only accept file names, so the file is a memfd, opened through /proc, or a
+    file on tmpfs where memfds aren't available. Either way its contents never touch disk.
+    """
+
+    def __init__(self, name: str = "document"):
+        try:
+            fd = os.memfd_create(name)
+            self.path = f"/proc/{os.getpid()}/fd/{fd}"
+            self.file: BinaryIO = os.fdopen(fd, "w+b")
+        except (AttributeError, OSError):
+            self.file = tempfile.NamedTemporaryFile(
+                dir="/dev/shm" if os.path.isdir("/dev/shm") else None
+            )
+            self.path = self.file.name
+
+    def sniff_mime_type(self) -> str:
+        """Detect the file's MIME type from its first few KB."""
+        self.file.flush()
+        self.file.seek(0)
+        head = self.file.read(SNIFF_BYTES)
+        self.file.seek(0, os.SEEK_END)
+        return magic.from_buffer(head, mime=True)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self) -> "InMemoryFile":
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+
 async def load_file(file_path: str) -> list[Document]:
     """Load a file and return a list of documents."""
 
     mime_type = magic.from_file(file_path, mime=True)
 
-    loader = HANDLERS.get(mime_type)
+    return await document_parser.parse(file_path, mime_type)
 
-    if loader:
-        return await loader(file_path).aload()
-    raise ValueError(f"Unsupported file type: {mime_type}")
+
+async def load_chunks(
+    file: InMemoryFile,
+    max_chunk_size_tokens: int = DEFAULT_CHUNK_SIZE_TOKENS,
+    chunk_overlap_tokens: int = DEFAULT_CHUNK_OVERLAP_TOKENS,
+) -> AsyncIterator[Document]:
+    """Load a file and yield its chunks.
+
+    The file is parsed and split in a worker process, which sends chunks back as it goes and
+    pauses while the caller is behind.
+    """
+
+    mime_type = file.sniff_mime_type()
+
+    async for chunk in document_parser.stream(
+        file.path, mime_type, (max_chunk_size_tokens, chunk_overlap_tokens)
+    ):
+        yield chunk
+
+
+def static_chunking_strategy(
+    chunking_strategy: dict | None = None,
+) -> ChunkingStrategyStatic:
+    """The chunk sizes a file will be split with, given the strategy requested for it.
+
+    No strategy or an "auto" strategy use the default sizes.
+    """
+    if chunking_strategy and chunking_strategy["type"] == "static":
+        return ChunkingStrategyStatic(
+            type="static",
+            static=ChunkingStrategyStaticStatic(**chunking_strategy["static"]),
+        )
+
+    return ChunkingStrategyStatic(
+        type="static",
+        static=ChunkingStrategyStaticStatic(
+            max_chunk_size_tokens=DEFAULT_CHUNK_SIZE_TOKENS,
+            chunk_overlap_tokens=DEFAULT_CHUNK_OVERLAP_TOKENS,
+        ),
+    )
 
 
 async def split(docs: list[Document]) -> list[Document]:
     """Split a document into chunks."""
+    return await _text_splitter().atransform_documents(docs)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_tokenizer() -> Tokenizer | None:
+    # Only load from a local file, air-gapped deployments can't reach the Hugging Face Hub
+    if not os.path.isfile(EMBEDDINGS_TOKENIZER):
+        logging.warning(
+            "Tokenizer {} not found, estimating token counts instead".format(
+                EMBEDDINGS_TOKENIZER
+            )
+        )
+        return None
+
+    try:
+        return Tokenizer.from_file(EMBEDDINGS_TOKENIZER)
+    except Exception:
+        logging.exception(
+            "Unable to load tokenizer {}, estimating token counts instead".format(
+                EMBEDDINGS_TOKENIZER
+            )
+        )
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens the embeddings model sees in a text."""
+    tokenizer = _load_tokenizer()
+    if tokenizer is None:
+        # Without the tokenizer, assume the usual ~4 characters per token of English text
+        return (len(text) + 3) // 4
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def _text_splitter(
+    chunk_size_tokens: int = DEFAULT_CHUNK_SIZE_TOKENS,
+    chunk_overlap_tokens: int = DEFAULT_CHUNK_OVERLAP_TOKENS,
+) -> RecursiveCharacterTextSplitter:
     separators = [
         "\n\n",
         "\n",
@@ -89,13 +448,10 @@ async def split(docs: list[Document]) -> list[Document]:
         "",
     ]
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        # TODO: This parameters might need to be tuned and/or exposed for configuration
-        chunk_size=500,
-        chunk_overlap=50,
-        length_function=len,
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size_tokens,
+        chunk_overlap=chunk_overlap_tokens,
+        length_function=count_tokens,
         is_separator_regex=False,
         separators=separators,
     )
-
-    return await text_splitter.atransform_documents(docs)
@@ -0,0 +1,184 @@
+"""Content-addressed cache for document embeddings."""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+
+class DiskEmbeddingStore:
+    """Persistent cache tier backed by a SQLite file, shared by every API replica on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "create table if not exists embeddings (key text primary key, embedding blob)"
+            )
+
+    def get_many(self, keys: list[str]) -> dict[str, array]:
+        found: dict[str, array] = {}
+        with self._lock:
+            # Stay well under SQLite's limit on the number of query parameters
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                rows = self._connection.execute(
+                    "select key, embedding from embeddings where key in ({})".format(
+                        ", ".join("?" * len(batch))
+                    ),
+                    batch,
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob)
+        return found
+
+    def put_many(self, items: dict[str, array]):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "insert or replace into embeddings (key, embedding) values (?, ?)",
+                [(key, embedding.tobytes()) for key, embedding in items.items()],
+            )
+
+
+class EmbeddingCache:
+    """Two-tier cache of embeddings keyed by a hash of (embeddings model, text).
+
+    The in-memory tier is an LRU of `max_size` embeddings, stored as 32-bit floats (the
+    precision the backends return them in). The optional disk tier survives restarts and is
+    consulted on in-memory misses.
+    """
+
+    def __init__(self, max_size: int = 10000, store: DiskEmbeddingStore | None = None):
+        self.max_size = max_size
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, array] = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingCache":
+        """Build a cache using the LFAI_EMBEDDINGS_CACHE_* environment variables."""
+        store = None
+        if path := os.environ.get("LFAI_EMBEDDINGS_CACHE_PATH"):
+            try:
+                store = DiskEmbeddingStore(path)
+            except sqlite3.Error as exc:
+                logging.error(
+                    "Unable to open embeddings cache at {}: {}".format(path, exc)
+                )
+
+        return cls(
+            max_size=int(os.environ.get("LFAI_EMBEDDINGS_CACHE_SIZE", 10000)),
+            store=store,
+        )
+
+    async def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Look up embeddings, returning only the keys that were found.
+
+        Repeated keys are looked up (and counted in the hit rate) once.
+        """
+        keys = list(dict.fromkeys(keys))
+        found: dict[str, array] = {}
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.store:
+            try:
+                from_store = await asyncio.to_thread(self.store.get_many, missing)
+            except sqlite3.Error as exc:
+                logging.error("Unable to read embeddings cache: {}".format(exc))
+                from_store = {}
+            for key, embedding in from_store.items():
+                self._remember(key, embedding)
+            found.update(from_store)
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+
+        return {key: embedding.tolist() for key, embedding in found.items()}
+
+    async def put_many(self, items: dict[str, list[float]]):
+        """Add embeddings to every tier of the cache."""
+        packed = {key: array("f", embedding) for key, embedding in items.items()}
+        for key, embedding in packed.items():
+            self._remember(key, embedding)
+
+        if packed and self.store:
+            try:
+                await asyncio.to_thread(self.store.put_many, packed)
+            except sqlite3.Error as exc:
+                logging.error("Unable to write embeddings cache: {}".format(exc))
+
+    def _remember(self, key: str, embedding: array):
+        if self.max_size <= 0:
+            return
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+
+class QueryEmbeddingCache:
+    """LRU of query embeddings keyed by a hash of (embeddings model, query), expiring after
+    `ttl` seconds.
+
+    Kept apart from document embeddings: queries are short-lived, may be sensitive and are
+    not worth writing to disk.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, array]] = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "QueryEmbeddingCache":
+        """Build a cache using the LFAI_QUERY_EMBEDDINGS_CACHE_* environment variables."""
+        return cls(
+            max_size=int(os.environ.get("LFAI_QUERY_EMBEDDINGS_CACHE_SIZE", 1000)),
+            ttl=float(os.environ.get("LFAI_QUERY_EMBEDDINGS_CACHE_TTL", 3600)),
+        )
+
+    def get(self, key: str) -> list[float] | None:
+        """Look up an embedding, returning None if it isn't cached or has expired."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1].tolist()
+
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, embedding: list[float]):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, array("f", embedding))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+embeddings_cache = EmbeddingCache.from_env()
+query_embeddings_cache = QueryEmbeddingCache.from_env()
+
+
+def get_embeddings_cache() -> EmbeddingCache:
+    return embeddings_cache
+
+
+def get_query_embeddings_cache() -> QueryEmbeddingCache:
+    return query_embeddings_cache
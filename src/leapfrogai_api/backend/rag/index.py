@@ -1,8 +1,11 @@
 """Indexing service for RAG files."""
 
+import asyncio
 import logging
-import tempfile
+import os
 import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
 from fastapi import HTTPException, UploadFile, status
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
@@ -10,16 +13,23 @@ from openai.types.beta.vector_store import FileCounts, VectorStore
 from openai.types.beta.vector_stores import VectorStoreFile
 from openai.types.beta.vector_stores.vector_store_file import LastError
 from supabase import AClient as AsyncClient
-from leapfrogai_api.backend.rag.document_loader import load_file, split
+from leapfrogai_api.backend.rag.document_loader import (
+    DocumentParsingError,
+    InMemoryFile,
+    load_chunks,
+    static_chunking_strategy,
+)
 from leapfrogai_api.backend.rag.leapfrogai_embeddings import LeapfrogAIEmbeddings
 from leapfrogai_api.data.crud_file_bucket import CRUDFileBucket
 from leapfrogai_api.data.crud_file_object import CRUDFileObject, FilterFileObject
 from leapfrogai_api.data.crud_vector_store import CRUDVectorStore, FilterVectorStore
 from leapfrogai_api.backend.types import (
+    ToolResourcesFileSearchVectorStoreChunkingStrategy,
     VectorStoreStatus,
     VectorStoreFileStatus,
     CreateVectorStoreRequest,
     ModifyVectorStoreRequest,
+    SearchMode,
 )
 from leapfrogai_api.data.crud_vector_store_file import (
     CRUDVectorStoreFile,
@@ -33,11 +43,105 @@ embeddings_type: type[Embeddings] | type[LeapfrogAIEmbeddings] | None = (
     LeapfrogAIEmbeddings
 )
 
+# Number of vectors written per insert request and how many of those requests run at once
+INSERT_BATCH_SIZE = int(os.getenv("LFAI_INDEX_INSERT_BATCH_SIZE", 100))
+INSERT_CONCURRENCY = int(os.getenv("LFAI_INDEX_INSERT_CONCURRENCY", 4))
+
+# Number of files indexed at once across the API and within a single vector store
+INDEX_CONCURRENCY = int(os.getenv("LFAI_INDEX_CONCURRENCY", 8))
+INDEX_CONCURRENCY_PER_VECTOR_STORE = int(
+    os.getenv("LFAI_INDEX_CONCURRENCY_PER_VECTOR_STORE", 4)
+)
+
 
 class FileAlreadyIndexedError(Exception):
     """Raised when a file is already indexed."""
 
 
+class IndexingLimiter:
+    """Bounds how many files are indexed at once, both overall and per vector store."""
+
+    def __init__(self, max_concurrent: int, max_concurrent_per_vector_store: int):
+        self.global_slots = asyncio.Semaphore(max(max_concurrent, 1))
+        self.max_concurrent_per_vector_store = max(max_concurrent_per_vector_store, 1)
+        self._vector_store_slots: dict[str, asyncio.Semaphore] = {}
+        self._waiting: dict[str, int] = {}
+
+    @asynccontextmanager
+    async def slot(self, vector_store_id: str):
+        """Wait for a free slot in the vector store, then for a free global one."""
+        vector_store_slots = self._vector_store_slots.setdefault(
+            vector_store_id, asyncio.Semaphore(self.max_concurrent_per_vector_store)
+        )
+        self._waiting[vector_store_id] = self._waiting.get(vector_store_id, 0) + 1
+        try:
+            async with vector_store_slots, self.global_slots:
+                yield
+        finally:
+            # Forget the vector store once none of its files are waiting or indexing
+            self._waiting[vector_store_id] -= 1
+            if not self._waiting[vector_store_id]:
+                del self._waiting[vector_store_id]
+                del self._vector_store_slots[vector_store_id]
+
+
+class IndexingQueue:
+    """Runs indexing jobs in the background, as many at once as the limiter allows.
+
+    Jobs wait for a slot in the order they were submitted. Until the queue is started (by the
+    app's lifespan), jobs are run inline instead, which keeps routers that are mounted on their
+    own, such as in tests, working without a background loop.
+    """
+
+    def __init__(self, limiter: IndexingLimiter):
+        self.limiter = limiter
+        self.running = False
+        self._tasks: set[asyncio.Task] = set()
+
+    def start(self):
+        self.running = True
+
+    async def stop(self):
+        """Cancel the jobs that are still queued or running and wait for them to wind down."""
+        self.running = False
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs that are queued or running."""
+        return len(self._tasks)
+
+    async def submit(self, vector_store_id: str, job: Callable[[], Awaitable[None]]):
+        if not self.running:
+            await self._run(vector_store_id, job)
+            return
+
+        task = asyncio.create_task(self._run(vector_store_id, job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, vector_store_id: str, job: Callable[[], Awaitable[None]]):
+        async with self.limiter.slot(vector_store_id):
+            try:
+                await job()
+            except Exception:
+                logging.exception(
+                    "Indexing job failed for vector store %s", vector_store_id
+                )
+
+
+indexing_limiter = IndexingLimiter(
+    INDEX_CONCURRENCY, INDEX_CONCURRENCY_PER_VECTOR_STORE
+)
+indexing_queue = IndexingQueue(indexing_limiter)
+
+# Serializes file count refreshes so a slower, stale refresh can't overwrite a newer one
+_file_counts_lock = asyncio.Lock()
+
+
 class IndexingService:
     """Service for indexing files into a vector store."""
 
@@ -47,8 +151,19 @@ class IndexingService:
         self.query_name: str = "match_vectors"
         self.table_name: str = "vector_content"
 
-    async def index_file(self, vector_store_id: str, file_id: str) -> VectorStoreFile:
-        """Index a file into a vector store."""
+    async def index_file(
+        self,
+        vector_store_id: str,
+        file_id: str,
+        chunking_strategy: ToolResourcesFileSearchVectorStoreChunkingStrategy
+        | None = None,
+    ) -> VectorStoreFile:
+        """Add a file to a vector store and queue it for indexing.
+
+        The file is returned with an in_progress status, which is updated once the queued job
+        has parsed, embedded and stored its contents. Its chunking strategy records the chunk
+        sizes it is split with, "auto" or no strategy resolving to the defaults.
+        """
 
         crud_vector_store_file = CRUDVectorStoreFile(db=self.db)
         crud_vector_store = CRUDVectorStore(db=self.db)
@@ -66,92 +181,177 @@ class IndexingService:
             raise ValueError("Vector store not found")
 
         crud_file_object = CRUDFileObject(db=self.db)
-        crud_file_bucket = CRUDFileBucket(db=self.db, model=UploadFile)
 
         file_object = await crud_file_object.get(filters=FilterFileObject(id=file_id))
 
         if not file_object:
             raise ValueError("File not found")
-        file_bytes = await crud_file_bucket.download(id_=file_id)
-
-        with tempfile.NamedTemporaryFile(suffix=file_object.filename) as temp_file:
-            temp_file.write(file_bytes)
-            temp_file.seek(0)
-            documents = await load_file(temp_file.name)
-            chunks = await split(documents)
-
-            if len(chunks) == 0:
-                vector_store_file = VectorStoreFile(
-                    id=file_id,
-                    created_at=0,
-                    last_error=LastError(
-                        message="No text found in file", code="parsing_error"
-                    ),
-                    object="vector_store.file",
-                    status=VectorStoreFileStatus.FAILED.value,
-                    usage_bytes=0,
-                    vector_store_id=vector_store_id,
-                )
-                return await crud_vector_store_file.create(object_=vector_store_file)
-
-            vector_store_file = VectorStoreFile(
-                id=file_id,
-                created_at=0,
-                last_error=None,
-                object="vector_store.file",
-                status=VectorStoreFileStatus.IN_PROGRESS.value,
-                usage_bytes=0,
-                vector_store_id=vector_store_id,
-            )
 
-            vector_store_file = await crud_vector_store_file.create(
-                object_=vector_store_file
+        vector_store_file = VectorStoreFile(
+            id=file_id,
+            created_at=0,
+            last_error=None,
+            object="vector_store.file",
+            status=VectorStoreFileStatus.IN_PROGRESS.value,
+            usage_bytes=0,
+            vector_store_id=vector_store_id,
+            chunking_strategy=static_chunking_strategy(chunking_strategy),
+        )
+
+        vector_store_file = await crud_vector_store_file.create(
+            object_=vector_store_file
+        )
+
+        await indexing_queue.submit(
+            vector_store_id,
+            lambda: self._index_file_job(vector_store_file, file_object.filename),
+        )
+
+        return await crud_vector_store_file.get(
+            filters=FilterVectorStoreFile(vector_store_id=vector_store_id, id=file_id)
+        )
+
+    async def index_files(
+        self,
+        vector_store_id: str,
+        file_ids: list[str],
+        chunking_strategy: ToolResourcesFileSearchVectorStoreChunkingStrategy
+        | None = None,
+    ) -> list[VectorStoreFile]:
+        """Add a list of files to a vector store and queue them for indexing.
+
+        A file that can't be added is logged and does not stop the others from being added.
+        """
+        responses = await asyncio.gather(
+            *(
+                self._index_file_isolated(vector_store_id, file_id, chunking_strategy)
+                for file_id in file_ids
             )
+        )
+
+        return [response for response in responses if response is not None]
 
+    async def _index_file_isolated(
+        self,
+        vector_store_id: str,
+        file_id: str,
+        chunking_strategy: ToolResourcesFileSearchVectorStoreChunkingStrategy | None,
+    ) -> VectorStoreFile | None:
+        """Add a file to a vector store, returning None instead of raising."""
         try:
-            ids = await self.aadd_documents(
-                documents=chunks,
+            return await self.index_file(
                 vector_store_id=vector_store_id,
                 file_id=file_id,
+                chunking_strategy=chunking_strategy,
             )
+        except FileAlreadyIndexedError:
+            logging.info("File %s already exists and cannot be re-indexed", file_id)
+        except Exception:
+            logging.exception("Failed to index file %s", file_id)
+        return None
 
-            if len(ids) == 0:
-                vector_store_file.status = VectorStoreFileStatus.FAILED.value
-            else:
-                vector_store_file.status = VectorStoreFileStatus.COMPLETED.value
-
-            await crud_vector_store_file.update(
-                id_=vector_store_file.id, object_=vector_store_file
+    async def _index_file_job(self, vector_store_file: VectorStoreFile, filename: str):
+        """Parse, embed and store a queued file, then record how it went."""
+        vector_store_file.status = VectorStoreFileStatus.FAILED.value
+        try:
+            vector_store_file.last_error = await self._load_and_add_documents(
+                vector_store_file, filename
             )
-        except Exception as exc:
-            vector_store_file.status = VectorStoreFileStatus.FAILED.value
-            await crud_vector_store_file.update(
-                id_=vector_store_file.id, object_=vector_store_file
+            if vector_store_file.last_error is None:
+                vector_store_file.status = VectorStoreFileStatus.COMPLETED.value
+        except asyncio.CancelledError:
+            vector_store_file.status = VectorStoreFileStatus.CANCELLED.value
+            raise
+        except Exception:
+            logging.exception("Failed to index file %s", vector_store_file.id)
+            vector_store_file.last_error = LastError(
+                message="Failed to index file", code="internal_error"
             )
-            raise exc
+        finally:
+            await asyncio.shield(self._finish_file(vector_store_file))
 
-        return await crud_vector_store_file.get(
-            filters=FilterVectorStoreFile(vector_store_id=vector_store_id, id=file_id)
-        )
+    async def _load_and_add_documents(
+        self, vector_store_file: VectorStoreFile, filename: str
+    ) -> LastError | None:
+        """Add a file's contents to its vector store, returning why it couldn't be if so."""
+        file_id = vector_store_file.id
+        chunk_sizes = vector_store_file.chunking_strategy.static
+
+        crud_file_bucket = CRUDFileBucket(db=self.db, model=UploadFile)
+
+        with InMemoryFile(name=filename) as file:
+            await crud_file_bucket.download_to(id_=file_id, file=file.file)
 
-    async def index_files(
-        self, vector_store_id: str, file_ids: list[str]
-    ) -> list[VectorStoreFile]:
-        """Index a list of files into a vector store."""
-        responses = []
-        for file_id in file_ids:
             try:
-                response = await self.index_file(
-                    vector_store_id=vector_store_id, file_id=file_id
+                ids = await self.aadd_document_stream(
+                    documents=load_chunks(
+                        file,
+                        max_chunk_size_tokens=chunk_sizes.max_chunk_size_tokens,
+                        chunk_overlap_tokens=chunk_sizes.chunk_overlap_tokens,
+                    ),
+                    vector_store_id=vector_store_file.vector_store_id,
+                    file_id=file_id,
                 )
-                responses.append(response)
-            except FileAlreadyIndexedError:
-                logging.info("File %s already exists and cannot be re-indexed", file_id)
-                continue
-            except Exception as exc:
-                raise exc
+            except DocumentParsingError:
+                logging.exception("Unable to parse file: %s", file_id)
+                await self._remove_partial_file(vector_store_file)
+                return LastError(message="Unable to parse file", code="parsing_error")
+            except (Exception, asyncio.CancelledError):
+                await asyncio.shield(self._remove_partial_file(vector_store_file))
+                raise
+
+        if len(ids) == 0:
+            return LastError(message="No text found in file", code="parsing_error")
+
+        return None
+
+    async def _remove_partial_file(self, vector_store_file: VectorStoreFile):
+        """Delete the vectors already stored for a file whose indexing didn't finish."""
+        crud_vector_content = CRUDVectorContent(db=self.db)
+        await crud_vector_content.delete_vectors(
+            vector_store_id=vector_store_file.vector_store_id,
+            file_id=vector_store_file.id,
+        )
+
+    async def _finish_file(self, vector_store_file: VectorStoreFile):
+        """Save the outcome of indexing a file and update its vector store's file counts."""
+        crud_vector_store_file = CRUDVectorStoreFile(db=self.db)
+        await crud_vector_store_file.update(
+            id_=vector_store_file.id, object_=vector_store_file
+        )
+        await self._refresh_file_counts(vector_store_file.vector_store_id)
+
+    async def _refresh_file_counts(self, vector_store_id: str) -> VectorStore | None:
+        """Recount a vector store's files, marking it completed once none are in progress."""
+        crud_vector_store_file = CRUDVectorStoreFile(db=self.db)
+        crud_vector_store = CRUDVectorStore(db=self.db)
+
+        async with _file_counts_lock:
+            vector_store_files = (
+                await crud_vector_store_file.list(
+                    filters=FilterVectorStoreFile(vector_store_id=vector_store_id)
+                )
+                or []
+            )
 
-        return responses
+            statuses = [
+                vector_store_file.status for vector_store_file in vector_store_files
+            ]
+            file_counts = FileCounts(
+                cancelled=statuses.count(VectorStoreFileStatus.CANCELLED.value),
+                completed=statuses.count(VectorStoreFileStatus.COMPLETED.value),
+                failed=statuses.count(VectorStoreFileStatus.FAILED.value),
+                in_progress=statuses.count(VectorStoreFileStatus.IN_PROGRESS.value),
+                total=len(statuses),
+            )
+
+            return await crud_vector_store.update_file_counts(
+                id_=vector_store_id,
+                file_counts=file_counts,
+                status=VectorStoreStatus.IN_PROGRESS.value
+                if file_counts.in_progress
+                else VectorStoreStatus.COMPLETED.value,
+            )
 
     async def create_new_vector_store(
         self, request: CreateVectorStoreRequest
@@ -182,21 +382,12 @@ class IndexingService:
             new_vector_store = await crud_vector_store.create(object_=vector_store)
 
             if request.file_ids != []:
-                responses = await self.index_files(
-                    new_vector_store.id, request.file_ids
+                await self.index_files(
+                    new_vector_store.id, request.file_ids, request.chunking_strategy
                 )
 
-                for response in responses:
-                    await self._increment_vector_store_file_status(
-                        new_vector_store, response
-                    )
-
-            new_vector_store.status = VectorStoreStatus.COMPLETED.value
-
-            return await crud_vector_store.update(
-                id_=new_vector_store.id,
-                object_=new_vector_store,
-            )
+            # Stays in_progress until the queued files have been indexed
+            return await self._refresh_file_counts(new_vector_store.id)
         except Exception as exc:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -242,19 +433,13 @@ class IndexingService:
             )  # Sets status to in_progress for the duration of this function
 
             if request.file_ids:
-                responses = await self.index_files(
-                    new_vector_store.id, request.file_ids
+                await self.index_files(
+                    new_vector_store.id, request.file_ids, request.chunking_strategy
                 )
-                for response in responses:
-                    await self._increment_vector_store_file_status(
-                        new_vector_store, response
-                    )
-
-            new_vector_store.status = VectorStoreStatus.COMPLETED.value
 
             last_active_at = int(time.time())
             new_vector_store.last_active_at = (
-                last_active_at  # Update after indexing files
+                last_active_at  # Update after queueing files
             )
             expires_after, expires_at = request.get_expiry(last_active_at)
 
@@ -262,10 +447,13 @@ class IndexingService:
                 new_vector_store.expires_after = expires_after
                 new_vector_store.expires_at = expires_at
 
-            return await crud_vector_store.update(
+            await crud_vector_store.update(
                 id_=vector_store_id,
                 object_=new_vector_store,
             )
+
+            # Stays in_progress until the queued files have been indexed
+            return await self._refresh_file_counts(vector_store_id)
         except Exception as exc:
             logging.error(exc)
             raise HTTPException(
@@ -293,46 +481,106 @@ class IndexingService:
         documents: list[Document],
         vector_store_id: str,
         file_id: str,
-        batch_size: int = 100,
+        batch_size: int = INSERT_BATCH_SIZE,
+        concurrency: int = INSERT_CONCURRENCY,
     ) -> list[str]:
         """Adds documents to the vector store in batches.
         Args:
             documents (list[Document]): A list of Langchain Document objects to be added.
             vector_store_id (str): The ID of the vector store where the documents will be added.
             file_id (str): The ID of the file associated with the documents.
-            batch_size (int): The size of the batches that will
-            be pushed to the db. This value defaults to 100
-                as a balance between the memory impact of large files and performance improvements from batching.
+            batch_size (int): The number of rows pushed to the db in each insert request. This value
+                defaults to LFAI_INDEX_INSERT_BATCH_SIZE (100) as a balance between the memory impact
+                of large files and performance improvements from batching.
+            concurrency (int): The maximum number of insert requests in flight at once. This value
+                defaults to LFAI_INDEX_INSERT_CONCURRENCY (4).
         Returns:
             List[str]: A list of IDs assigned to the added documents.
         Raises:
             Any exceptions that may occur during the execution of the method.
         """
-        ids = []
-        embeddings = await self.embeddings.aembed_documents(
-            texts=[document.page_content for document in documents]
+
+        async def iterate_documents():
+            for document in documents:
+                yield document
+
+        return await self.aadd_document_stream(
+            iterate_documents(), vector_store_id, file_id, batch_size, concurrency
         )
 
-        vectors: list[Vector] = []
-        for document, embedding in zip(documents, embeddings):
-            vector = Vector(
-                id="",
-                vector_store_id=vector_store_id,
-                file_id=file_id,
-                content=document.page_content,
-                metadata=document.metadata,
-                embedding=embedding,
-            )
-            vectors.append(vector)
+    async def aadd_document_stream(
+        self,
+        documents: AsyncIterator[Document],
+        vector_store_id: str,
+        file_id: str,
+        batch_size: int = INSERT_BATCH_SIZE,
+        concurrency: int = INSERT_CONCURRENCY,
+    ) -> list[str]:
+        """Adds documents to the vector store in batches as they are produced.
+        Args:
+            documents (AsyncIterator[Document]): The Langchain Document objects to be added.
+            vector_store_id (str): The ID of the vector store where the documents will be added.
+            file_id (str): The ID of the file associated with the documents.
+            batch_size (int): The number of documents embedded and pushed to the db together.
+            concurrency (int): The maximum number of batches being embedded and stored at once.
+                At most this many more are buffered before reading from `documents` pauses, so
+                memory use doesn't grow with the number of documents.
+        Returns:
+            List[str]: A list of IDs assigned to the added documents.
+        Raises:
+            Any exceptions raised while producing, embedding or storing the documents.
+        """
+        batch_size = max(batch_size, 1)
+        concurrency = max(concurrency, 1)
 
+        batches: asyncio.Queue[list[Document] | None] = asyncio.Queue(
+            maxsize=concurrency
+        )
         crud_vector_content = CRUDVectorContent(db=self.db)
 
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i : i + batch_size]
+        async def produce():
+            batch: list[Document] = []
+            async for document in documents:
+                batch.append(document)
+                if len(batch) == batch_size:
+                    await batches.put(batch)
+                    batch = []
+            if batch:
+                await batches.put(batch)
+            for _ in range(concurrency):
+                await batches.put(None)
+
+        async def consume() -> list[str]:
+            ids: list[str] = []
+            while (batch := await batches.get()) is not None:
+                embeddings = await self.embeddings.aembed_documents(
+                    texts=[document.page_content for document in batch]
+                )
+                vectors = [
+                    Vector(
+                        id="",
+                        vector_store_id=vector_store_id,
+                        file_id=file_id,
+                        content=document.page_content,
+                        metadata=document.metadata,
+                        embedding=embedding,
+                    )
+                    for document, embedding in zip(batch, embeddings)
+                ]
+                ids.extend(await crud_vector_content.add_vectors(vectors))
+            return ids
+
+        tasks = [asyncio.create_task(produce())] + [
+            asyncio.create_task(consume()) for _ in range(concurrency)
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            # Stop the other stages if one of them failed
+            for task in tasks:
+                task.cancel()
 
-            response = await crud_vector_content.add_vectors(batch)
-            ids.extend([item.id for item in response])
-        return ids
+        return [id_ for ids in results[1:] for id_ in ids]
 
     async def asimilarity_search(self, query: str, vector_store_id: str, k: int = 4):
         """Searches for similar documents.
@@ -353,16 +601,34 @@ class IndexingService:
             query=vector, vector_store_id=vector_store_id, k=k
         )
 
-    async def _increment_vector_store_file_status(
-        self, vector_store: VectorStore, file_response: VectorStoreFile
+    async def asimilarity_search_multi(
+        self,
+        query: str,
+        vector_store_ids: list[str],
+        k: int = 4,
+        mode: SearchMode = SearchMode.VECTOR,
     ):
-        """Increment the file count of a given vector store based on the file response"""
-        if file_response.status == VectorStoreFileStatus.COMPLETED.value:
-            vector_store.file_counts.completed += 1
-        elif file_response.status == VectorStoreFileStatus.FAILED.value:
-            vector_store.file_counts.failed += 1
-        elif file_response.status == VectorStoreFileStatus.IN_PROGRESS.value:
-            vector_store.file_counts.in_progress += 1
-        elif file_response.status == VectorStoreFileStatus.CANCELLED.value:
-            vector_store.file_counts.cancelled += 1
-        vector_store.file_counts.total += 1
+        """Searches several vector stores at once, embedding the query a single time.
+
+        Args:
+            query (str): The query string.
+            vector_store_ids (list[str]): The IDs of the vector stores to search in.
+            k (int, optional): The number of similar documents to retrieve across all of the
+                vector stores. Defaults to 4.
+            mode (SearchMode, optional): Whether to rank by vector similarity alone or fuse it
+                with full-text rank. Defaults to vector.
+
+        Returns:
+            The response from the database after executing the search.
+
+        """
+        vector = await self.embeddings.aembed_query(query)
+
+        crud_vector_content = CRUDVectorContent(db=self.db)
+        return await crud_vector_content.search(
+            query_text=query,
+            query=vector,
+            vector_store_ids=vector_store_ids,
+            k=k,
+            mode=mode,
+        )
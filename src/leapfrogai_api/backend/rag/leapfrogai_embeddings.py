@@ -1,11 +1,55 @@
 """LeapfrogAI Embeddings via Langchain Embeddings Interface."""
 
+import asyncio
 import os
+from typing import Iterator
+
+import grpc
 import leapfrogai_sdk as lfai
 from leapfrogai_api.utils import get_model_config
+from leapfrogai_api.utils.cache_key import cache_key
 from leapfrogai_api.backend.grpc_client import create_embeddings
+from leapfrogai_api.backend.rag.embeddings_cache import (
+    get_embeddings_cache,
+    get_query_embeddings_cache,
+)
 import logging
 
+# Limits on the texts sent in one embeddings request, keeping large files well under gRPC's
+# default 4MB message size and letting the requests be spread over the backend's replicas
+EMBEDDINGS_BATCH_SIZE = int(os.getenv("LFAI_EMBEDDINGS_BATCH_SIZE", 64))
+EMBEDDINGS_BATCH_CHARACTERS = int(os.getenv("LFAI_EMBEDDINGS_BATCH_CHARACTERS", 200000))
+EMBEDDINGS_CONCURRENCY = int(os.getenv("LFAI_EMBEDDINGS_CONCURRENCY", 4))
+EMBEDDINGS_RETRIES = int(os.getenv("LFAI_EMBEDDINGS_RETRIES", 2))
+
+# Errors that a retry, possibly against another replica, can be expected to fix
+RETRYABLE_STATUS_CODES = (
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+)
+
+
+def sub_batches(
+    texts: list[str], max_size: int, max_characters: int
+) -> Iterator[list[str]]:
+    """Split texts into consecutive batches bounded by count and by total characters.
+
+    A text longer than max_characters is sent in a batch of its own.
+    """
+    batch: list[str] = []
+    characters = 0
+    for text in texts:
+        if batch and (
+            len(batch) >= max_size or characters + len(text) > max_characters
+        ):
+            yield batch
+            batch, characters = [], 0
+        batch.append(text)
+        characters += len(text)
+    if batch:
+        yield batch
+
 
 # Partially implements the Langchain Core Embeddings interface
 class LeapfrogAIEmbeddings:
@@ -24,26 +68,89 @@ class LeapfrogAIEmbeddings:
             list[list[float]]: The list of embedding vectors for each document.
         """
         model = await self._get_model()
+        cache = get_embeddings_cache()
+
+        keys = [cache_key(model.name, text) for text in texts]
+        embeddings = await cache.get_many(keys)
+
+        # Only embed each distinct text that isn't already cached
+        misses = {key: text for key, text in zip(keys, texts) if key not in embeddings}
+        if misses:
+            semaphore = asyncio.Semaphore(max(EMBEDDINGS_CONCURRENCY, 1))
+
+            async def embed_batch(batch: list[str]) -> list[list[float]]:
+                async with semaphore:
+                    return await self._embed_batch(batch)
+
+            batches = await asyncio.gather(
+                *(
+                    embed_batch(batch)
+                    for batch in sub_batches(
+                        list(misses.values()),
+                        max(EMBEDDINGS_BATCH_SIZE, 1),
+                        EMBEDDINGS_BATCH_CHARACTERS,
+                    )
+                )
+            )
+
+            new_embeddings = dict(
+                zip(misses, (embedding for batch in batches for embedding in batch))
+            )
+            await cache.put_many(new_embeddings)
+            embeddings.update(new_embeddings)
+
+        logging.debug(
+            "Embedded {} texts, {} of them by the backend".format(
+                len(texts), len(misses)
+            )
+        )
+
+        return [embeddings[key] for key in keys]
+
+    async def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embed one sub-batch, retrying transient failures on a freshly selected replica."""
         request = lfai.EmbeddingRequest(inputs=texts)
-        response = await create_embeddings(model=model, request=request)
-
-        list_of_embeddings = [data.embedding for data in response.data]
-
-        return list_of_embeddings
+        for attempt in range(EMBEDDINGS_RETRIES + 1):
+            model = await self._get_model()
+            try:
+                response = await create_embeddings(model=model, request=request)
+                return [data.embedding for data in response.data]
+            except grpc.aio.AioRpcError as exc:
+                if (
+                    exc.code() not in RETRYABLE_STATUS_CODES
+                    or attempt == EMBEDDINGS_RETRIES
+                ):
+                    raise
+                logging.warning(
+                    "Embeddings request to {} failed ({}), retrying".format(
+                        model.backend, exc.code().name
+                    )
+                )
+                await asyncio.sleep(0.5 * 2**attempt)
 
     async def aembed_query(self, text: str) -> list[float]:
         """Asynchronously embeds a query text.
 
+        Runs on the same thread query each turn, so recent queries are served from a
+        short-lived cache of their own.
+
         Args:
             text (str): The query text to be embedded.
 
         Returns:
             list[float]: The embedding vector for the query text.
         """
+        model = await self._get_model()
+        cache = get_query_embeddings_cache()
+
+        key = cache_key(model.name, text)
+        if (embedding := cache.get(key)) is not None:
+            return embedding
 
-        list_of_embeddings = await self.aembed_documents([text])
+        embedding = (await self._embed_batch([text]))[0]
+        cache.put(key, embedding)
 
-        return list_of_embeddings[0]
+        return embedding
 
     async def _get_model(
         self, model_name: str = os.getenv("DEFAULT_EMBEDDINGS_MODEL", "text-embeddings")
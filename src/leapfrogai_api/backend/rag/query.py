@@ -1,9 +1,93 @@
 """Service for querying the RAG model."""
 
+import logging
+import math
+import os
+
+import leapfrogai_sdk as lfai
 from supabase import AClient as AsyncClient
+from leapfrogai_api.backend.grpc_client import rerank
+from leapfrogai_api.backend.rag.document_loader import count_tokens
 from leapfrogai_api.backend.rag.index import IndexingService
+from leapfrogai_api.backend.types import SearchMode
+from leapfrogai_api.data.crud_vector_content import CRUDVectorContent
+from leapfrogai_api.utils import get_model_config
+from leapfrogai_api.utils.config import Model
 from postgrest.base_request_builder import SingleAPIResponse
 
+# How vector stores are searched when the caller doesn't say
+DEFAULT_SEARCH_MODE = SearchMode(os.getenv("LFAI_RAG_SEARCH_MODE", "hybrid"))
+
+# Model serving RerankService, unset to skip reranking, and how many candidates it rescores
+RERANK_MODEL = os.getenv("LFAI_RERANK_MODEL")
+RERANK_CANDIDATES = int(os.getenv("LFAI_RERANK_CANDIDATES", 20))
+
+# Defaults for maximal marginal relevance, which assistants can override. Unset lambda skips it.
+MMR_LAMBDA = (
+    float(os.environ["LFAI_RAG_MMR_LAMBDA"])
+    if os.getenv("LFAI_RAG_MMR_LAMBDA")
+    else None
+)
+MMR_CANDIDATES = int(os.getenv("LFAI_RAG_MMR_CANDIDATES", 20))
+# Chunks at least this similar to one already selected are dropped as near-duplicates
+DUPLICATE_THRESHOLD = float(os.getenv("LFAI_RAG_DUPLICATE_THRESHOLD", 0.95))
+
+
+def fit_to_budget(results: list[dict], k: int, max_tokens: int | None) -> list[dict]:
+    """Keep the first k results, skipping any that would take the total past max_tokens."""
+    kept: list[dict] = []
+    tokens = 0
+    for result in results:
+        if len(kept) == k:
+            break
+        result_tokens = count_tokens(result["content"])
+        if max_tokens is not None and tokens + result_tokens > max_tokens:
+            continue
+        kept.append(result)
+        tokens += result_tokens
+    return kept
+
+
+def _normalize(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def maximal_marginal_relevance(
+    relevance: list[float],
+    embeddings: list[list[float]],
+    lambda_mult: float,
+    duplicate_threshold: float = DUPLICATE_THRESHOLD,
+) -> list[int]:
+    """Order candidates by maximal marginal relevance, returning their indices.
+
+    Each step picks the candidate with the best lambda_mult * relevance - (1 - lambda_mult) *
+    its highest cosine similarity to those already picked. Candidates whose similarity to a
+    picked one reaches duplicate_threshold are dropped.
+    """
+    vectors = [_normalize(embedding) for embedding in embeddings]
+    # Highest similarity of each remaining candidate to the selected ones
+    redundancy = {i: 0.0 for i in range(len(vectors))}
+    selected: list[int] = []
+
+    while redundancy:
+        best = max(
+            redundancy,
+            key=lambda i: lambda_mult * relevance[i]
+            - (1 - lambda_mult) * redundancy[i],
+        )
+        selected.append(best)
+        del redundancy[best]
+
+        for i in list(redundancy):
+            similarity = sum(a * b for a, b in zip(vectors[i], vectors[best]))
+            if similarity >= duplicate_threshold:
+                del redundancy[i]
+            else:
+                redundancy[i] = max(redundancy[i], similarity)
+
+    return selected
+
 
 class QueryService:
     """Service for querying the RAG model."""
@@ -13,7 +97,14 @@ class QueryService:
         self.db = db
 
     async def query_rag(
-        self, query: str, vector_store_id: str, k: int = 5
+        self,
+        query: str,
+        vector_store_id: str,
+        k: int = 5,
+        mode: SearchMode = DEFAULT_SEARCH_MODE,
+        max_tokens: int | None = None,
+        mmr_lambda: float | None = MMR_LAMBDA,
+        mmr_candidates: int = MMR_CANDIDATES,
     ) -> SingleAPIResponse:
         """
         Query the Vector Store.
@@ -22,16 +113,127 @@ class QueryService:
             query (str): The query string.
             vector_store_id (str): The ID of the vector store.
             k (int, optional): The number of results to retrieve. Defaults to 5.
+            mode (SearchMode, optional): Vector similarity alone, or fused with full-text
+                rank. Defaults to LFAI_RAG_SEARCH_MODE.
+            max_tokens (int, optional): Limit on the results' combined size, in tokens.
+            mmr_lambda (float, optional): Relevance weight for maximal marginal relevance,
+                unset to skip it. Defaults to LFAI_RAG_MMR_LAMBDA.
+            mmr_candidates (int, optional): Number of results maximal marginal relevance
+                selects from. Defaults to LFAI_RAG_MMR_CANDIDATES.
 
         Returns:
             dict: The response from the RAG model.
         """
+        return await self.query_rag_multi(
+            query=query,
+            vector_store_ids=[vector_store_id],
+            k=k,
+            mode=mode,
+            max_tokens=max_tokens,
+            mmr_lambda=mmr_lambda,
+            mmr_candidates=mmr_candidates,
+        )
+
+    async def query_rag_multi(
+        self,
+        query: str,
+        vector_store_ids: list[str],
+        k: int = 5,
+        mode: SearchMode = DEFAULT_SEARCH_MODE,
+        max_tokens: int | None = None,
+        mmr_lambda: float | None = MMR_LAMBDA,
+        mmr_candidates: int = MMR_CANDIDATES,
+    ) -> SingleAPIResponse:
+        """
+        Query several Vector Stores together.
+
+        When a reranker is configured, LFAI_RERANK_CANDIDATES results are retrieved and
+        rescored by it before the best k are kept. With mmr_lambda, the k are then chosen
+        from mmr_candidates results by maximal marginal relevance, dropping near-duplicates.
+
+        Args:
+            query (str): The query string.
+            vector_store_ids (list[str]): The IDs of the vector stores.
+            k (int, optional): The number of results to retrieve across all of the vector
+                stores. Defaults to 5.
+            mode (SearchMode, optional): Vector similarity alone, or fused with full-text
+                rank. Defaults to LFAI_RAG_SEARCH_MODE.
+            max_tokens (int, optional): Limit on the results' combined size, in tokens.
+            mmr_lambda (float, optional): Relevance weight for maximal marginal relevance,
+                unset to skip it. Defaults to LFAI_RAG_MMR_LAMBDA.
+            mmr_candidates (int, optional): Number of results maximal marginal relevance
+                selects from. Defaults to LFAI_RAG_MMR_CANDIDATES.
+
+        Returns:
+            dict: The merged top results from the vector stores.
+        """
         vector_store = IndexingService(db=self.db)
+        reranker = self._get_reranker()
 
-        response = await vector_store.asimilarity_search(
+        candidates = k
+        if reranker:
+            candidates = max(candidates, RERANK_CANDIDATES)
+        if mmr_lambda is not None:
+            candidates = max(candidates, mmr_candidates)
+
+        response = await vector_store.asimilarity_search_multi(
             query=query,
-            vector_store_id=vector_store_id,
-            k=k,
+            vector_store_ids=vector_store_ids,
+            k=candidates,
+            mode=mode,
         )
 
+        results = response.data
+        if reranker and len(results) > 1:
+            results = await self._rerank(reranker, query, results)
+        if mmr_lambda is not None and len(results) > 1:
+            results = await self._diversify(results[:mmr_candidates], mmr_lambda)
+        response.data = fit_to_budget(results, k, max_tokens)
+
         return response
+
+    def _get_reranker(self) -> Model | None:
+        if not RERANK_MODEL:
+            return None
+        if not (model := get_model_config().get_model_backend(model=RERANK_MODEL)):
+            logging.warning(f"Rerank model {RERANK_MODEL} not found, skipping rerank.")
+        return model
+
+    async def _rerank(
+        self, model: Model, query: str, results: list[dict]
+    ) -> list[dict]:
+        """Order results by the reranker's scores, keeping the search's order if it fails."""
+        try:
+            scores = await rerank(
+                model=model,
+                request=lfai.RerankRequest(
+                    query=query, documents=[result["content"] for result in results]
+                ),
+            )
+        except Exception:
+            logging.exception("Failed to rerank results, using the search's order")
+            return results
+
+        # The reranker's scores replace the search's as each result's similarity to the query
+        for score, result in zip(scores, results):
+            result["similarity"] = score
+
+        return sorted(results, key=lambda result: result["similarity"], reverse=True)
+
+    async def _diversify(self, results: list[dict], lambda_mult: float) -> list[dict]:
+        """Order results by maximal marginal relevance, dropping near-duplicates."""
+        crud_vector_content = CRUDVectorContent(db=self.db)
+        embeddings = await crud_vector_content.get_embeddings(
+            [result["id"] for result in results]
+        )
+
+        # Results whose embedding can't be found are left out of the comparison, at the end
+        found = [result for result in results if result["id"] in embeddings]
+        missing = [result for result in results if result["id"] not in embeddings]
+
+        order = maximal_marginal_relevance(
+            relevance=[result["similarity"] for result in found],
+            embeddings=[embeddings[result["id"]] for result in found],
+            lambda_mult=lambda_mult,
+        )
+        return [found[i] for i in order] + missing
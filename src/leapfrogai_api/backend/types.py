@@ -18,7 +18,7 @@ from openai.types.beta.thread_create_params import (
 )
 from openai.types.beta.threads.text_content_block_param import TextContentBlockParam
 from openai.types.beta.vector_store import ExpiresAfter
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 ##########
 # DEFAULTS
@@ -28,6 +28,10 @@ from pydantic import BaseModel, Field
 DEFAULT_MAX_COMPLETION_TOKENS = 4096
 DEFAULT_MAX_PROMPT_TOKENS = 4096
 
+# Bounds on a static chunking strategy, matching OpenAI's
+MIN_CHUNK_SIZE_TOKENS = 100
+MAX_CHUNK_SIZE_TOKENS = 4096
+
 
 ##########
 # GENERIC
@@ -553,6 +557,31 @@ class VectorStoreStatus(Enum):
     COMPLETED = "completed"
 
 
+def validate_chunking_strategy(
+    chunking_strategy: ToolResourcesFileSearchVectorStoreChunkingStrategy | None,
+) -> ToolResourcesFileSearchVectorStoreChunkingStrategy | None:
+    """Check that a static chunking strategy's sizes are within the supported bounds."""
+    if chunking_strategy and chunking_strategy["type"] == "static":
+        static = chunking_strategy["static"]
+        max_chunk_size_tokens = static["max_chunk_size_tokens"]
+        chunk_overlap_tokens = static["chunk_overlap_tokens"]
+
+        if not (
+            MIN_CHUNK_SIZE_TOKENS <= max_chunk_size_tokens <= MAX_CHUNK_SIZE_TOKENS
+        ):
+            raise ValueError(
+                "max_chunk_size_tokens must be between {} and {}".format(
+                    MIN_CHUNK_SIZE_TOKENS, MAX_CHUNK_SIZE_TOKENS
+                )
+            )
+        if not 0 <= chunk_overlap_tokens <= max_chunk_size_tokens // 2:
+            raise ValueError(
+                "chunk_overlap_tokens must be between 0 and half of max_chunk_size_tokens"
+            )
+
+    return chunking_strategy
+
+
 class CreateVectorStoreFileRequest(BaseModel):
     """Request object for creating a vector store file."""
 
@@ -572,6 +601,10 @@ class CreateVectorStoreFileRequest(BaseModel):
         examples=["file-abc123"],
     )
 
+    _validate_chunking_strategy = field_validator("chunking_strategy")(
+        validate_chunking_strategy
+    )
+
 
 class CreateVectorStoreRequest(BaseModel):
     """Request object for creating a vector store."""
@@ -596,6 +629,19 @@ class CreateVectorStoreRequest(BaseModel):
         description="Optional metadata for the vector store.",
         example={"project": "AI Research", "version": "1.0"},
     )
+    chunking_strategy: ToolResourcesFileSearchVectorStoreChunkingStrategy | None = (
+        Field(
+            default=None,
+            description="The strategy for chunking the files' content. Use 'auto' for automatic chunking.",
+            examples=[
+                ToolResourcesFileSearchVectorStoreChunkingStrategyAuto(type="auto")
+            ],
+        )
+    )
+
+    _validate_chunking_strategy = field_validator("chunking_strategy")(
+        validate_chunking_strategy
+    )
 
     def add_days_to_timestamp(self, timestamp: int, days: int) -> int:
         """
@@ -686,6 +732,41 @@ class ModifyMessageRequest(BaseModel):
 ################
 
 
+class SearchMode(Enum):
+    """Enum for how a vector store is searched."""
+
+    VECTOR = "vector"  # Cosine similarity of the embeddings
+    HYBRID = "hybrid"  # Full-text rank fused with cosine similarity
+
+
+class FileSearchSettings(BaseModel):
+    """Settings for the file_search tool, read from its overrides on an assistant or run.
+
+    Besides OpenAI's max_num_results, LeapfrogAI accepts settings for maximal marginal
+    relevance (MMR), which trades some relevance for diversity among the retrieved chunks.
+    """
+
+    max_num_results: int | None = Field(
+        default=None,
+        ge=1,
+        le=50,
+        description="The maximum number of chunks retrieved for the prompt.",
+    )
+    mmr_lambda: float | None = Field(
+        default=None,
+        ge=0,
+        le=1,
+        description="Weight of relevance against diversity when selecting chunks with MMR, "
+        "1 being relevance alone. Leave unset to skip MMR.",
+    )
+    mmr_candidates: int | None = Field(
+        default=None,
+        ge=1,
+        le=100,
+        description="Number of candidate chunks MMR selects from.",
+    )
+
+
 class SearchItem(BaseModel):
     """Object representing a single item in a search result."""
 
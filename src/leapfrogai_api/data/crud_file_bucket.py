@@ -1,8 +1,14 @@
 """CRUD Operations for the Files Bucket."""
 
+from typing import BinaryIO
+
+import httpx
 from supabase import AClient as AsyncClient
 from fastapi import UploadFile
 
+# Signed URLs only need to be valid when the download starts
+SIGNED_URL_EXPIRES_IN = 60
+
 
 class CRUDFileBucket:
     """CRUD Operations for FileBucket."""
@@ -23,6 +29,22 @@ class CRUDFileBucket:
 
         return await self.client.storage.from_("file_bucket").download(path=f"{id_}")
 
+    async def download_to(self, id_: str, file: BinaryIO, chunk_size: int = 1 << 20):
+        """Stream a file from the file bucket into an open file, without holding it in memory."""
+
+        # storage3 only offers whole-file downloads, so stream from a short-lived signed URL
+        signed = await self.client.storage.from_("file_bucket").create_signed_url(
+            path=f"{id_}", expires_in=SIGNED_URL_EXPIRES_IN
+        )
+
+        async with (
+            httpx.AsyncClient() as http_client,
+            http_client.stream("GET", signed["signedURL"]) as response,
+        ):
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(chunk_size):
+                file.write(chunk)
+
     async def delete(self, id_: str):
         """Delete a file from the file bucket."""
 
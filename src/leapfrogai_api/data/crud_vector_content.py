@@ -1,9 +1,18 @@
 """CRUD Operations for VectorStore."""
 
+import json
+import os
+import uuid
+from postgrest.types import ReturnMethod
 from pydantic import BaseModel
 from supabase import AClient as AsyncClient
+from leapfrogai_api.backend.types import SearchMode
 from leapfrogai_api.data.crud_base import get_user_id
-import ast
+
+# Default accuracy of the approximate nearest neighbor search: the HNSW candidate list size and
+# the number of IVFFlat lists probed. Unset leaves the database's defaults (40 and 1).
+EF_SEARCH = int(os.getenv("LFAI_RAG_EF_SEARCH", 0)) or None
+PROBES = int(os.getenv("LFAI_RAG_PROBES", 0)) or None
 
 
 class Vector(BaseModel):
@@ -22,8 +31,8 @@ class CRUDVectorContent:
         self.db = db
         self.table_name = "vector_content"
 
-    async def add_vectors(self, object_: list[Vector]) -> list[Vector]:
-        """Create new row."""
+    async def add_vectors(self, object_: list[Vector]) -> list[str]:
+        """Insert rows in a single request, returning their ids."""
 
         user_id = await get_user_id(self.db)
 
@@ -32,36 +41,18 @@ class CRUDVectorContent:
         for vector in object_:
             dict_ = vector.model_dump()
             dict_["user_id"] = user_id
-            if "id" in dict_:
-                del dict_["id"]
+            # Ids are assigned here so the insert doesn't have to echo every embedding back
+            dict_["id"] = vector.id or str(uuid.uuid4())
 
             rows.append(dict_)
 
-        data, _count = await self.db.table(self.table_name).insert(dict_).execute()
-
-        _, response = data
+        await (
+            self.db.table(self.table_name)
+            .insert(rows, returning=ReturnMethod.minimal)
+            .execute()
+        )
 
-        final_response = []
-        try:
-            for item in response:
-                if "user_id" in item:
-                    del item["user_id"]
-                if isinstance(item["embedding"], str):
-                    item["embedding"] = self.string_to_float_list(item["embedding"])
-                final_response.append(
-                    Vector(
-                        id=item["id"],
-                        vector_store_id=item["vector_store_id"],
-                        file_id=item["file_id"],
-                        content=item["content"],
-                        metadata=item["metadata"],
-                        embedding=item["embedding"],
-                    )
-                )
-
-            return final_response
-        except Exception as e:
-            raise e
+        return [row["id"] for row in rows]
 
     async def delete_vectors(self, vector_store_id: str, file_id: str) -> bool:
         """Delete a vector store file by its ID."""
@@ -77,7 +68,38 @@ class CRUDVectorContent:
 
         return bool(response)
 
-    async def similarity_search(self, query: list[float], vector_store_id: str, k: int):
+    async def get_embeddings(self, ids: list[str]) -> dict[str, list[float]]:
+        """Get the embeddings of vectors by their IDs."""
+        data, _count = (
+            await self.db.table(self.table_name)
+            .select("id, embedding")
+            .in_("id", ids)
+            .execute()
+        )
+
+        _, response = data
+
+        # pgvector values come back in their text form, "[0.1,0.2,...]"
+        return {
+            row["id"]: json.loads(row["embedding"])
+            if isinstance(row["embedding"], str)
+            else row["embedding"]
+            for row in response
+        }
+
+    async def similarity_search(
+        self,
+        query: list[float],
+        vector_store_id: str,
+        k: int,
+        ef_search: int | None = EF_SEARCH,
+        probes: int | None = PROBES,
+    ):
+        """Find the k vectors closest to the query.
+
+        ef_search (HNSW) and probes (IVFFlat) widen the approximate search for this query,
+        trading latency for recall.
+        """
         user_id = await get_user_id(self.db)
 
         params = {
@@ -86,17 +108,80 @@ class CRUDVectorContent:
             "vs_id": vector_store_id,
             "user_id": user_id,
         }
+        if ef_search:
+            params["ef_search"] = ef_search
+        if probes:
+            params["probes"] = probes
 
         return await self.db.rpc("match_vectors", params).execute()
 
-    @staticmethod
-    def string_to_float_list(s: str) -> list[float]:
-        try:
-            # Remove any whitespace and convert to a Python list
-            cleaned_string = s.strip()
-            python_list = ast.literal_eval(cleaned_string)
-
-            # Convert all elements to float
-            return [float(x) for x in python_list]
-        except (ValueError, SyntaxError) as e:
-            raise e
+    async def similarity_search_multi(
+        self,
+        query: list[float],
+        vector_store_ids: list[str],
+        k: int,
+        ef_search: int | None = EF_SEARCH,
+        probes: int | None = PROBES,
+    ):
+        """Find the k vectors closest to the query across several vector stores."""
+        user_id = await get_user_id(self.db)
+
+        params = {
+            "query_embedding": query,
+            "match_limit": k,
+            "vs_ids": vector_store_ids,
+            "user_id": user_id,
+        }
+        if ef_search:
+            params["ef_search"] = ef_search
+        if probes:
+            params["probes"] = probes
+
+        return await self.db.rpc("match_vectors_multi", params).execute()
+
+    async def hybrid_search(
+        self,
+        query_text: str,
+        query: list[float],
+        vector_store_ids: list[str],
+        k: int,
+        ef_search: int | None = EF_SEARCH,
+        probes: int | None = PROBES,
+    ):
+        """Find the k best matches for the query across several vector stores, ranking them by
+        both full-text rank and vector similarity."""
+        user_id = await get_user_id(self.db)
+
+        params = {
+            "query_text": query_text,
+            "query_embedding": query,
+            "match_limit": k,
+            "vs_ids": vector_store_ids,
+            "user_id": user_id,
+        }
+        if ef_search:
+            params["ef_search"] = ef_search
+        if probes:
+            params["probes"] = probes
+
+        return await self.db.rpc("match_hybrid", params).execute()
+
+    async def search(
+        self,
+        query_text: str,
+        query: list[float],
+        vector_store_ids: list[str],
+        k: int,
+        mode: SearchMode = SearchMode.VECTOR,
+    ):
+        """Find the k best matches for the query across several vector stores."""
+        if mode == SearchMode.HYBRID:
+            return await self.hybrid_search(
+                query_text=query_text,
+                query=query,
+                vector_store_ids=vector_store_ids,
+                k=k,
+            )
+        return await self.similarity_search_multi(
+            query=query, vector_store_ids=vector_store_ids, k=k
+        )
@@ -4,6 +4,7 @@ import time
 
 from pydantic import BaseModel
 from openai.types.beta import VectorStore
+from openai.types.beta.vector_store import FileCounts
 from supabase import AClient as AsyncClient
 from leapfrogai_api.data.crud_base import CRUDBase
 
@@ -77,6 +78,26 @@ class CRUDVectorStore(CRUDBase[VectorStore]):
             return self.model(**response[0])
         return None
 
+    async def update_file_counts(
+        self, id_: str, file_counts: FileCounts, status: str
+    ) -> VectorStore | None:
+        """Update only the file counts and status of a vector store, leaving the rest untouched."""
+
+        data, _count = (
+            await self.db.table(self.table_name)
+            .update({"file_counts": file_counts.model_dump(), "status": status})
+            .eq("id", id_)
+            .execute()
+        )
+
+        _, response = data
+
+        if response:
+            if "user_id" in response[0]:
+                del response[0]["user_id"]
+            return self.model(**response[0])
+        return None
+
     async def delete(self, filters: FilterVectorStore | None = None) -> bool:
         """Delete a vector store by its ID."""
         return await super().delete(filters=filters.model_dump() if filters else None)
@@ -8,6 +8,7 @@ from fastapi import FastAPI
 from fastapi.exception_handlers import request_validation_exception_handler
 from fastapi.exceptions import RequestValidationError
 
+from leapfrogai_api.backend.rag.index import indexing_queue
 from leapfrogai_api.routers.base import router as base_router
 from leapfrogai_api.routers.leapfrogai import auth
 from leapfrogai_api.routers.leapfrogai import models as lfai_models
@@ -36,8 +37,15 @@ async def lifespan(app: FastAPI):
     # startup
     logging.info("Starting to watch for configs")
     asyncio.create_task(get_model_config().watch_and_load_configs())
+    logging.info("Starting to probe backend health")
+    health_task = asyncio.create_task(get_model_config().watch_backend_health())
+    logging.info("Starting the background indexing queue")
+    indexing_queue.start()
     yield
     # shutdown
+    health_task.cancel()
+    logging.info("Cancelling {} pending indexing jobs".format(indexing_queue.pending))
+    await indexing_queue.stop()
     logging.info("Clearing model configs")
     asyncio.create_task(get_model_config().clear_all_models())
 
@@ -2,8 +2,8 @@
 
 from fastapi import APIRouter
 from postgrest.base_request_builder import SingleAPIResponse
-from leapfrogai_api.backend.rag.query import QueryService
-from leapfrogai_api.backend.types import SearchResponse
+from leapfrogai_api.backend.rag.query import DEFAULT_SEARCH_MODE, QueryService
+from leapfrogai_api.backend.types import SearchMode, SearchResponse
 from leapfrogai_api.routers.supabase_session import Session
 
 router = APIRouter(
@@ -17,6 +17,7 @@ async def search(
     query: str,
     vector_store_id: str,
     k: int = 5,
+    mode: SearchMode = DEFAULT_SEARCH_MODE,
 ) -> SearchResponse:
     """
     Performs a similarity search of the vector store.
@@ -26,6 +27,8 @@ async def search(
         query (str): The input query string.
         vector_store_id (str): The ID of the vector store.
         k (int, optional): The number of results to retrieve. Defaults to 5.
+        mode (SearchMode, optional): "vector" ranks by embedding similarity, "hybrid" also
+            matches the query's exact terms. Defaults to LFAI_RAG_SEARCH_MODE.
 
     Returns:
         SearchResponse: The search response from the vector store.
@@ -35,6 +38,7 @@ async def search(
         query=query,
         vector_store_id=vector_store_id,
         k=k,
+        mode=mode,
     )
 
     return SearchResponse(data=result.data)
@@ -1,5 +1,6 @@
 """OpenAI Chat API router."""
 
+from contextlib import aclosing
 from typing import Annotated, AsyncGenerator, Any
 from fastapi import HTTPException, APIRouter, Depends
 import leapfrogai_sdk as lfai
@@ -81,5 +82,7 @@ async def chat_complete_stream_raw(
         temperature=req.temperature,
     )
 
-    async for response in stream_chat_completion_raw(model, request):
-        yield response
+    # aclosing makes sure the gRPC stream is cancelled as soon as this generator is closed
+    async with aclosing(stream_chat_completion_raw(model, request)) as stream:
+        async for response in stream:
+            yield response
@@ -118,6 +118,7 @@ class CreateAssistantRequest(BaseModel):
                 name="{}_vector_store".format(self.name),
                 expires_after=None,
                 metadata={},
+                chunking_strategy=vector_store_params_dict.get("chunking_strategy"),
             )
 
             vector_store = await indexing_service.create_new_vector_store(
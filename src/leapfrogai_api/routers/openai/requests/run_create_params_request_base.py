@@ -47,8 +47,14 @@ from leapfrogai_api.backend.converters import (
     from_text_to_message,
     from_chat_completion_choice_to_thread_message_delta,
 )
+from leapfrogai_api.backend.prompt import (
+    RAG_CONTEXT_SHARE,
+    count_message_tokens,
+    truncate_messages,
+)
 from leapfrogai_api.backend.rag.query import QueryService
 from leapfrogai_api.backend.types import (
+    FileSearchSettings,
     ChatMessage,
     SearchResponse,
     ChatCompletionResponse,
@@ -146,6 +152,7 @@ class RunCreateParamsRequestBase(BaseModel):
             self.temperature = self.temperature or assistant.temperature
             self.top_p = self.top_p or assistant.top_p
             self.instructions = self.instructions or assistant.instructions or ""
+            self.tools = self.tools or assistant.tools
 
         return assistant
 
@@ -177,6 +184,21 @@ class RunCreateParamsRequestBase(BaseModel):
 
         return False
 
+    def get_file_search_settings(self) -> FileSearchSettings:
+        """Read the settings from the overrides of the file_search tool, if there is one."""
+        for tool in self.tools:
+            if isinstance(tool, FileSearchTool) and tool.file_search:
+                try:
+                    return FileSearchSettings.model_validate(
+                        tool.file_search.model_dump()
+                    )
+                except ValidationError:
+                    logging.warning(
+                        "Ignoring invalid file_search settings: %s",
+                        tool.file_search.model_dump(),
+                    )
+        return FileSearchSettings()
+
     async def list_messages(self, thread_id: str, session: Session) -> list[Message]:
         """List all the messages in a thread."""
         try:
@@ -230,6 +252,8 @@ class RunCreateParamsRequestBase(BaseModel):
                 )
 
         first_message: ChatMessage = chat_thread_messages[0]
+        model = str(self.model)
+        max_prompt_tokens = cast(int, self.max_prompt_tokens)
 
         # Holds the converted thread's messages, this will be built up with a series of push operations
         chat_messages: list[ChatMessage] = []
@@ -244,43 +268,84 @@ class RunCreateParamsRequestBase(BaseModel):
                 ChatMessage(role="system", content=additional_instructions)
             )
 
-        # 3 - The existing messages with everything after the first message
-        for message in chat_thread_messages:
-            chat_messages.append(message)
+        # The instructions are always sent, the RAG context and the thread share what's left
+        remaining_tokens: int = max_prompt_tokens - sum(
+            await count_message_tokens(model, chat_messages)
+        )
+        thread_token_counts: list[int] = await count_message_tokens(
+            model, chat_thread_messages
+        )
 
         use_rag: bool = self.can_use_rag(tool_resources)
 
         rag_message: str = "Here are relevant docs needed to reply:\n"
+        rag_chat_message: ChatMessage | None = None
+
+        # The RAG results are fit into their share of the budget, without crowding out the user's query
+        rag_max_tokens: int = (
+            min(
+                int(max_prompt_tokens * RAG_CONTEXT_SHARE),
+                remaining_tokens - thread_token_counts[-1],
+            )
+            - (await count_message_tokens(model, [ChatMessage(content=rag_message)]))[0]
+        )
 
-        # 4 - The RAG results are appended behind the user's query
         file_ids: set[str] = set()
-        if use_rag:
+        if use_rag and rag_max_tokens <= 0:
+            logging.warning("No room left in the prompt for RAG results, skipping RAG")
+        elif use_rag:
             query_service = QueryService(db=session)
             file_search: BetaThreadToolResourcesFileSearch = cast(
                 BetaThreadToolResourcesFileSearch, tool_resources.file_search
             )
             vector_store_ids: list[str] = cast(list[str], file_search.vector_store_ids)
 
-            for vector_store_id in vector_store_ids:
-                rag_results_raw: SingleAPIResponse[
-                    SearchResponse
-                ] = await query_service.query_rag(
-                    query=first_message.content,
-                    vector_store_id=vector_store_id,
-                )
-                rag_responses: SearchResponse = SearchResponse(
-                    data=rag_results_raw.data
-                )
-
-                # Insert the RAG response messages just before the user's query
-                for count, rag_response in enumerate(rag_responses.data):
-                    file_ids.add(rag_response.file_id)
-                    response_with_instructions: str = f"{rag_response.content}"
-                    rag_message += f"{response_with_instructions}\n"
+            # Only the settings the tool overrides are passed, the rest keep their defaults
+            file_search_settings: FileSearchSettings = self.get_file_search_settings()
+            query_settings: dict = {}
+            if file_search_settings.max_num_results:
+                query_settings["k"] = file_search_settings.max_num_results
+            if file_search_settings.mmr_lambda is not None:
+                query_settings["mmr_lambda"] = file_search_settings.mmr_lambda
+            if file_search_settings.mmr_candidates:
+                query_settings["mmr_candidates"] = file_search_settings.mmr_candidates
+
+            # One search over every attached vector store, returning their merged top results
+            rag_results_raw: SingleAPIResponse[
+                SearchResponse
+            ] = await query_service.query_rag_multi(
+                query=first_message.content,
+                vector_store_ids=vector_store_ids,
+                max_tokens=rag_max_tokens,
+                **query_settings,
+            )
+            rag_responses: SearchResponse = SearchResponse(data=rag_results_raw.data)
+
+            for count, rag_response in enumerate(rag_responses.data):
+                file_ids.add(rag_response.file_id)
+                response_with_instructions: str = f"{rag_response.content}"
+                rag_message += f"{response_with_instructions}\n"
+
+            rag_chat_message = ChatMessage(role="user", content=rag_message)
+            remaining_tokens -= (await count_message_tokens(model, [rag_chat_message]))[
+                0
+            ]
+
+        # 3 - The existing messages, as many of the most recent as fit in what's left
+        chat_messages.extend(
+            truncate_messages(
+                chat_thread_messages,
+                thread_token_counts,
+                remaining_tokens,
+                self.truncation_strategy,
+            )
+        )
 
+        # 4 - The RAG results are appended behind the user's query
+        if rag_chat_message:
             chat_messages.insert(
                 len(chat_messages) - 1,  # Insert right before the user message
-                ChatMessage(role="user", content=rag_message),
+                rag_chat_message,
             )  # TODO: Should this go in user or something else like function?
 
         return chat_messages, list(file_ids)
@@ -434,18 +499,22 @@ class RunCreateParamsRequestBase(BaseModel):
         response: str = ""
 
         index: int = 0
-        async for streaming_response in chat_response:
-            random_uuid: UUID = uuid.uuid4()
-            # Build up the llm response so that it can be committed to the db as a new message
-            response += streaming_response.choices[0].chat_item.content
-            thread_message_event = (
-                await from_chat_completion_choice_to_thread_message_delta(
-                    index, random_uuid, streaming_response
+        try:
+            async for streaming_response in chat_response:
+                random_uuid: UUID = uuid.uuid4()
+                # Build up the llm response so that it can be committed to the db as a new message
+                response += streaming_response.choices[0].chat_item.content
+                thread_message_event = (
+                    await from_chat_completion_choice_to_thread_message_delta(
+                        index, random_uuid, streaming_response
+                    )
                 )
-            )
-            yield from_assistant_stream_event_to_str(thread_message_event)
-            yield "\n\n"
-            index += 1
+                yield from_assistant_stream_event_to_str(thread_message_event)
+                yield "\n\n"
+                index += 1
+        finally:
+            # Cancels the backend's generation if the client disconnected mid-stream
+            await chat_response.aclose()
 
         new_message.content = from_text_to_message(response, file_ids).content
         new_message.created_at = int(time.time())
@@ -119,12 +119,17 @@ async def create_vector_store_file(
     request: CreateVectorStoreFileRequest,
     session: Session,
 ) -> VectorStoreFile:
-    """Create a file in a vector store."""
+    """Create a file in a vector store.
+
+    The file is indexed in the background, poll it until its status is no longer in_progress.
+    """
 
     try:
         indexing_service = IndexingService(db=session)
         vector_store_file = await indexing_service.index_file(
-            vector_store_id=vector_store_id, file_id=request.file_id
+            vector_store_id=vector_store_id,
+            file_id=request.file_id,
+            chunking_strategy=request.chunking_strategy,
         )
         return vector_store_file
     except Exception as exc:
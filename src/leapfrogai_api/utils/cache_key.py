@@ -0,0 +1,8 @@
+"""Keys for caches of results that depend on a model and a text."""
+
+import hashlib
+
+
+def cache_key(model_name: str, text: str) -> str:
+    """Hash of the model and the text it processes."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
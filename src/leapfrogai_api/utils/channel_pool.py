@@ -0,0 +1,148 @@
+"""Pool of long-lived gRPC channels keyed by model backend address."""
+
+import asyncio
+import logging
+import os
+
+import grpc
+
+
+class _InFlightInterceptor(
+    grpc.aio.UnaryUnaryClientInterceptor,
+    grpc.aio.UnaryStreamClientInterceptor,
+    grpc.aio.StreamUnaryClientInterceptor,
+    grpc.aio.StreamStreamClientInterceptor,
+):
+    """Counts the RPCs that are currently open on a channel."""
+
+    def __init__(self):
+        self.in_flight = 0
+
+    async def _track(self, continuation, client_call_details, request):
+        self.in_flight += 1
+        try:
+            call = await continuation(client_call_details, request)
+        except Exception:
+            self.in_flight -= 1
+            raise
+        call.add_done_callback(self._release)
+        return call
+
+    def _release(self, _call):
+        self.in_flight -= 1
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        return await self._track(continuation, client_call_details, request)
+
+    async def intercept_unary_stream(self, continuation, client_call_details, request):
+        return await self._track(continuation, client_call_details, request)
+
+    async def intercept_stream_unary(
+        self, continuation, client_call_details, request_iterator
+    ):
+        return await self._track(continuation, client_call_details, request_iterator)
+
+    async def intercept_stream_stream(
+        self, continuation, client_call_details, request_iterator
+    ):
+        return await self._track(continuation, client_call_details, request_iterator)
+
+
+class PooledChannel:
+    """A gRPC channel and the number of RPCs currently open on it."""
+
+    def __init__(self, backend: str, options: list[tuple[str, int]]):
+        self._interceptor = _InFlightInterceptor()
+        self.channel = grpc.aio.insecure_channel(
+            backend, options=options, interceptors=[self._interceptor]
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self._interceptor.in_flight
+
+
+class ChannelPool:
+    """Lazily creates and reuses gRPC channels for each model backend.
+
+    A backend gets its first channel on first use. Additional channels (up to `size`) are only
+    opened when every existing channel already carries `max_concurrent_streams` RPCs, which is
+    the point at which a single HTTP/2 connection would start queueing streams on the server.
+    """
+
+    def __init__(self, size: int = 4, max_concurrent_streams: int = 100):
+        self.size = max(size, 1)
+        self.max_concurrent_streams = max(max_concurrent_streams, 1)
+        self._channels: dict[str, list[PooledChannel]] = {}
+
+    @classmethod
+    def from_env(cls) -> "ChannelPool":
+        """Build a pool using the LFAI_GRPC_* environment variables."""
+        return cls(
+            size=int(os.environ.get("LFAI_GRPC_CHANNELS_PER_BACKEND", 4)),
+            max_concurrent_streams=int(
+                os.environ.get("LFAI_GRPC_MAX_CONCURRENT_STREAMS", 100)
+            ),
+        )
+
+    def get(self, backend: str) -> grpc.aio.Channel:
+        """Get the least busy channel for a backend, opening a new one if all are saturated."""
+        pooled = self._channels.setdefault(backend, [])
+
+        least_busy = min(pooled, key=lambda p: p.in_flight, default=None)
+        if least_busy is None or (
+            least_busy.in_flight >= self.max_concurrent_streams
+            and len(pooled) < self.size
+        ):
+            # Local subchannel pools keep gRPC from collapsing our channels onto one connection
+            least_busy = PooledChannel(
+                backend, options=[("grpc.use_local_subchannel_pool", 1)]
+            )
+            pooled.append(least_busy)
+            logging.info(
+                "Opened gRPC channel {}/{} for {}".format(
+                    len(pooled), self.size, backend
+                )
+            )
+
+        return least_busy.channel
+
+    def discard(self, backend: str):
+        """Drop the channels for a backend, closing them in the background."""
+        pooled = self._channels.pop(backend, [])
+        if not pooled:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Without a running loop the channels are closed when they are garbage collected
+            return
+
+        for p in pooled:
+            loop.create_task(p.channel.close())
+        logging.info("Closed gRPC channels for {}".format(backend))
+
+    async def close(self):
+        """Close every channel in the pool."""
+        pooled = [p for channels in self._channels.values() for p in channels]
+        self._channels = {}
+        await asyncio.gather(*(p.channel.close() for p in pooled))
+
+    def in_flight(self, backend: str) -> int:
+        """Number of in-flight RPCs across all channels for a backend."""
+        return sum(p.in_flight for p in self._channels.get(backend, []))
+
+    def stats(self) -> dict[str, list[int]]:
+        """Number of in-flight RPCs for each channel, keyed by backend."""
+        return {
+            backend: [p.in_flight for p in pooled]
+            for backend, pooled in self._channels.items()
+        }
+
+
+channel_pool = ChannelPool.from_env()
+
+
+def get_channel_pool() -> ChannelPool:
+    return channel_pool
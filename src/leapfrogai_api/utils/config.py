@@ -1,23 +1,67 @@
+import asyncio
 import fnmatch
 import glob
 import logging
 import os
-from typing import List
+import random
+from typing import Literal
 
 import toml
 import yaml
+from pydantic import BaseModel, PrivateAttr, computed_field
 from watchfiles import Change, awatch
 
+from leapfrogai_api.utils.channel_pool import get_channel_pool
+from leapfrogai_api.utils.health import get_backend_health
+
 logging.basicConfig(level=logging.INFO)
 
 
-class Model:
+RoutingPolicy = Literal["round_robin", "least_outstanding", "power_of_two"]
+
+
+class Model(BaseModel):
     name: str
-    backend: str
+    backends: list[str]
+    routing: RoutingPolicy = "round_robin"
+
+    _next_replica: int = PrivateAttr(default=0)
+
+    @property
+    def backend(self) -> str:
+        return self.backends[0]
+
+    @computed_field
+    @property
+    def status(self) -> dict[str, str]:
+        """The last known health status of each replica."""
+        health = get_backend_health()
+        return {backend: health.status(backend) for backend in self.backends}
+
+    def select_backend(self) -> str:
+        """Pick the replica that should serve the next request."""
+        # fall back to every replica when none are healthy so the request fails with a real error
+        health = get_backend_health()
+        replicas = [b for b in self.backends if health.is_healthy(b)] or self.backends
+        if len(replicas) == 1:
+            return replicas[0]
+
+        # start each scan from a rotating offset so ties don't always land on the first replica
+        start = self._next_replica % len(replicas)
+        self._next_replica = start + 1
+        replicas = replicas[start:] + replicas[:start]
 
-    def __init__(self, name: str, backend: str, capabilities: List[str] | None = None):
-        self.name = name
-        self.backend = backend
+        if self.routing == "round_robin":
+            return replicas[0]
+
+        in_flight = get_channel_pool().in_flight
+        if self.routing == "power_of_two":
+            replicas = random.sample(replicas, 2)
+        return min(replicas, key=in_flight)
+
+    def for_request(self) -> "Model":
+        """A copy of this model bound to the single replica chosen for one request."""
+        return self.model_copy(update={"backends": [self.select_backend()]})
 
 
 class Config:
@@ -73,10 +117,26 @@ class Config:
                 for match in filtered_deleted_matches:
                     self.remove_model_by_config(match)
 
+    async def watch_backend_health(self):
+        # Get the probe interval and timeout (in seconds) from the environment variables if provided
+        interval = float(os.environ.get("LFAI_HEALTH_CHECK_INTERVAL", 10))
+        timeout = float(os.environ.get("LFAI_HEALTH_CHECK_TIMEOUT", 2))
+        if interval <= 0:
+            logging.info("Backend health checks are disabled")
+            return
+
+        # Probe every configured replica until the end of time
+        while True:
+            backends = [b for model in self.models.values() for b in model.backends]
+            await get_backend_health().probe(backends, timeout)
+            await asyncio.sleep(interval)
+
     async def clear_all_models(self):
         # reset the model config on shutdown (so old model configs don't get cached)
         self.models = {}
         self.config_sources = {}
+        await get_channel_pool().close()
+        await get_backend_health().close()
         logging.info("All models have been removed")
 
     def load_config_file(self, directory: str, config_file: str):
@@ -124,15 +184,24 @@ class Config:
 
     def get_model_backend(self, model: str) -> Model | None:
         if model in self.models:
-            return self.models[model]
+            return self.models[model].for_request()
         else:
             return None
 
     def parse_models(self, loaded_artifact, config_file):
         for m in loaded_artifact["models"]:
-            model_config = Model(name=m["name"], backend=m["backend"])
+            # "backend" may be a single address or a list of replica addresses
+            backends = m.get("backends", m.get("backend"))
+            model_config = Model(
+                name=m["name"],
+                backends=[backends] if isinstance(backends, str) else backends,
+                routing=m.get("routing", "round_robin"),
+            )
 
+            previous_model = self.models.get(m["name"])
             self.models[m["name"]] = model_config
+            if previous_model:
+                self.release_unused_backends(previous_model.backends)
             try:
                 self.config_sources[config_file].append(m["name"])
             except KeyError:
@@ -140,9 +209,18 @@ class Config:
             logging.info("added {} to model config".format(m["name"]))
 
     def remove_model_by_config(self, config_file):
+        removed_backends = []
         for model_name in self.config_sources[config_file]:
-            self.models.pop(model_name)
+            removed_backends.extend(self.models.pop(model_name).backends)
             logging.info("removed {} from model config".format(model_name))
 
         # clear config once all corresponding models are deleted
         self.config_sources.pop(config_file)
+
+        self.release_unused_backends(removed_backends)
+
+    def release_unused_backends(self, backends: list[str]):
+        # several models can be served by the same backend, so only close channels nobody uses
+        in_use = {b for model in self.models.values() for b in model.backends}
+        for backend in set(backends) - in_use:
+            get_channel_pool().discard(backend)
@@ -0,0 +1,77 @@
+"""Health tracking for model backends using the gRPC health service exposed by the SDK."""
+
+import asyncio
+import logging
+from typing import Iterable
+
+import grpc
+from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+# A backend that has never been probed is assumed to be healthy
+UNKNOWN = "unknown"
+UNREACHABLE = "unreachable"
+HEALTHY_STATUSES = (UNKNOWN, "serving")
+
+
+class BackendHealth:
+    """Tracks the serving status of every backend replica.
+
+    Probes run over their own channels rather than the channel pool, so they are not counted as
+    in-flight requests by the load-aware routing policies.
+    """
+
+    def __init__(self):
+        self._status: dict[str, str] = {}
+        self._channels: dict[str, grpc.aio.Channel] = {}
+
+    def status(self, backend: str) -> str:
+        return self._status.get(backend, UNKNOWN)
+
+    def is_healthy(self, backend: str) -> bool:
+        return self.status(backend) in HEALTHY_STATUSES
+
+    async def check(self, backend: str, timeout: float) -> str:
+        """Call grpc.health.v1.Health/Check on a backend and record the result."""
+        if backend not in self._channels:
+            self._channels[backend] = grpc.aio.insecure_channel(backend)
+        stub = health_pb2_grpc.HealthStub(self._channels[backend])
+        try:
+            response = await stub.Check(
+                health_pb2.HealthCheckRequest(service=""), timeout=timeout
+            )
+            status = health_pb2.HealthCheckResponse.ServingStatus.Name(
+                response.status
+            ).lower()
+        except grpc.aio.AioRpcError as exc:
+            logging.debug("Health check for {} failed: {}".format(backend, exc))
+            status = UNREACHABLE
+
+        if status != self.status(backend):
+            logging.info("Backend {} is now {}".format(backend, status))
+        self._status[backend] = status
+
+        return status
+
+    async def probe(self, backends: Iterable[str], timeout: float):
+        """Check all backends concurrently and forget the ones no longer configured."""
+        backends = set(backends)
+        await asyncio.gather(*(self.check(b, timeout) for b in backends))
+
+        for backend in set(self._status) - backends:
+            self._status.pop(backend)
+        await asyncio.gather(
+            *(self._channels.pop(b).close() for b in set(self._channels) - backends)
+        )
+
+    async def close(self):
+        """Close the channels used for probing."""
+        channels = list(self._channels.values())
+        self._channels = {}
+        await asyncio.gather(*(c.close() for c in channels))
+
+
+backend_health = BackendHealth()
+
+
+def get_backend_health() -> BackendHealth:
+    return backend_health
@@ -56,6 +56,23 @@ from leapfrogai_sdk.name.name_pb2_grpc import (
     NameServiceServicer,
     NameServiceStub,
 )
+from leapfrogai_sdk.rerank.rerank_pb2 import RerankRequest, RerankResponse
+from leapfrogai_sdk.rerank.rerank_pb2_grpc import (
+    RerankService,
+    RerankServiceServicer,
+    RerankServiceStub,
+)
+from leapfrogai_sdk.tokenize.tokenize_pb2 import (
+    CountTokensResponse,
+    TokenizeRequest,
+    TokenizeResponse,
+    Tokens,
+)
+from leapfrogai_sdk.tokenize.tokenize_pb2_grpc import (
+    TokenizeService,
+    TokenizeServiceServicer,
+    TokenizeServiceStub,
+)
 from leapfrogai_sdk.serve import serve
 
 print("Initializing Leapfrog")
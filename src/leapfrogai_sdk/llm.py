@@ -1,5 +1,8 @@
+import asyncio
+from contextlib import aclosing
 from typing import Any, List, Optional, AsyncGenerator
 
+import grpc
 from pydantic import BaseModel
 
 from leapfrogai_sdk import (
@@ -14,6 +17,10 @@ from leapfrogai_sdk import (
     CompletionResponse,
     GrpcContext,
     CompletionUsage,
+    CountTokensResponse,
+    TokenizeRequest,
+    TokenizeResponse,
+    Tokens,
 )
 from leapfrogai_sdk.chat.chat_pb2 import Usage
 from enum import Enum
@@ -137,8 +144,9 @@ def LLM(_cls):
             gen_stream = self._build_gen_stream(prompt, request)
 
             content = ""
-            async for text_chunk in gen_stream:
-                content += text_chunk
+            async with aclosing(gen_stream):
+                async for text_chunk in gen_stream:
+                    content += text_chunk
 
             completion_token_count: int = await self.count_tokens(content)
 
@@ -165,16 +173,19 @@ def LLM(_cls):
             last_delta: str | None = None
             response_str: str = ""
 
-            async for text_chunk in gen_stream:
-                if last_delta:
-                    last_response: ChatCompletionResponse = (
-                        create_chat_completion_response(last_delta, FinishReason.NONE)
-                    )
-                    response_str += last_delta
+            async with aclosing(gen_stream):
+                async for text_chunk in gen_stream:
+                    if last_delta:
+                        last_response: ChatCompletionResponse = (
+                            create_chat_completion_response(
+                                last_delta, FinishReason.NONE
+                            )
+                        )
+                        response_str += last_delta
 
-                    yield last_response
+                        yield last_response
 
-                last_delta = text_chunk
+                    last_delta = text_chunk
 
             if last_delta:
                 response_str += last_delta
@@ -200,8 +211,9 @@ def LLM(_cls):
             gen_stream = self._build_gen_stream(request.prompt, request)
 
             content = ""
-            async for text_chunk in gen_stream:
-                content += text_chunk
+            async with aclosing(gen_stream):
+                async for text_chunk in gen_stream:
+                    content += text_chunk
 
             completion_token_count: int = await self.count_tokens(content)
 
@@ -223,16 +235,17 @@ def LLM(_cls):
             last_delta: str | None = None
             response_str: str = ""
 
-            async for text_chunk in gen_stream:
-                if last_delta:
-                    last_response = create_completion_response(
-                        text=last_delta, finish_reason=FinishReason.NONE
-                    )
-                    response_str += last_delta
+            async with aclosing(gen_stream):
+                async for text_chunk in gen_stream:
+                    if last_delta:
+                        last_response = create_completion_response(
+                            text=last_delta, finish_reason=FinishReason.NONE
+                        )
+                        response_str += last_delta
 
-                    yield last_response
+                        yield last_response
 
-                last_delta = text_chunk
+                    last_delta = text_chunk
 
             if last_delta:
                 response_str += last_delta
@@ -252,5 +265,29 @@ def LLM(_cls):
 
             yield last_response
 
+        async def CountTokens(
+            self, request: TokenizeRequest, context: GrpcContext
+        ) -> CountTokensResponse:
+            counts: list[int] = await asyncio.gather(
+                *(self.count_tokens(text) for text in request.texts)
+            )
+
+            return CountTokensResponse(counts=counts)
+
+        async def Tokenize(
+            self, request: TokenizeRequest, context: GrpcContext
+        ) -> TokenizeResponse:
+            # Returning the token ids themselves is optional for backends
+            if not hasattr(self, "tokenize"):
+                await context.abort(
+                    grpc.StatusCode.UNIMPLEMENTED, "Model does not support Tokenize"
+                )
+
+            ids: list[list[int]] = await asyncio.gather(
+                *(self.tokenize(text) for text in request.texts)
+            )
+
+            return TokenizeResponse(tokens=[Tokens(ids=text_ids) for text_ids in ids])
+
     NewClass.__name__ = _cls.__name__
     return NewClass
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: leapfrogai_sdk/rerank/rerank.proto
+# Protobuf Python Version: 4.25.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(
+    b'\n"leapfrogai_sdk/rerank/rerank.proto\x12\x06rerank"1\n\rRerankRequest\x12\r\n\x05query\x18\x01 \x01(\t\x12\x11\n\tdocuments\x18\x02 \x03(\t" \n\x0eRerankResponse\x12\x0e\n\x06scores\x18\x01 \x03(\x02\x32H\n\rRerankService\x12\x37\n\x06Rerank\x12\x15.rerank.RerankRequest\x1a\x16.rerank.RerankResponseB9Z7github.com/defenseunicorns/leapfrogai/pkg/client/rerankb\x06proto3'
+)
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(
+    DESCRIPTOR, "leapfrogai_sdk.rerank.rerank_pb2", _globals
+)
+if _descriptor._USE_C_DESCRIPTORS == False:
+    _globals["DESCRIPTOR"]._options = None
+    _globals[
+        "DESCRIPTOR"
+    ]._serialized_options = b"Z7github.com/defenseunicorns/leapfrogai/pkg/client/rerank"
+    _globals["_RERANKREQUEST"]._serialized_start = 46
+    _globals["_RERANKREQUEST"]._serialized_end = 95
+    _globals["_RERANKRESPONSE"]._serialized_start = 97
+    _globals["_RERANKRESPONSE"]._serialized_end = 129
+    _globals["_RERANKSERVICE"]._serialized_start = 131
+    _globals["_RERANKSERVICE"]._serialized_end = 203
+# @@protoc_insertion_point(module_scope)
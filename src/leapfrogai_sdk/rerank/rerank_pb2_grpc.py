@@ -0,0 +1,81 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+
+from leapfrogai_sdk.rerank import (
+    rerank_pb2 as leapfrogai__sdk_dot_rerank_dot_rerank__pb2,
+)
+
+
+class RerankServiceStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Rerank = channel.unary_unary(
+            "/rerank.RerankService/Rerank",
+            request_serializer=leapfrogai__sdk_dot_rerank_dot_rerank__pb2.RerankRequest.SerializeToString,
+            response_deserializer=leapfrogai__sdk_dot_rerank_dot_rerank__pb2.RerankResponse.FromString,
+        )
+
+
+class RerankServiceServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def Rerank(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+
+def add_RerankServiceServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+        "Rerank": grpc.unary_unary_rpc_method_handler(
+            servicer.Rerank,
+            request_deserializer=leapfrogai__sdk_dot_rerank_dot_rerank__pb2.RerankRequest.FromString,
+            response_serializer=leapfrogai__sdk_dot_rerank_dot_rerank__pb2.RerankResponse.SerializeToString,
+        ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+        "rerank.RerankService", rpc_method_handlers
+    )
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+# This class is part of an EXPERIMENTAL API.
+class RerankService(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def Rerank(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/rerank.RerankService/Rerank",
+            leapfrogai__sdk_dot_rerank_dot_rerank__pb2.RerankRequest.SerializeToString,
+            leapfrogai__sdk_dot_rerank_dot_rerank__pb2.RerankResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
@@ -11,6 +11,8 @@ from leapfrogai_sdk.chat import chat_pb2_grpc
 from leapfrogai_sdk.completion import completion_pb2_grpc
 from leapfrogai_sdk.embeddings import embeddings_pb2_grpc
 from leapfrogai_sdk.name import name_pb2_grpc
+from leapfrogai_sdk.rerank import rerank_pb2_grpc
+from leapfrogai_sdk.tokenize import tokenize_pb2_grpc
 
 
 async def serve(o, host="0.0.0.0", port=50051):
@@ -40,6 +42,14 @@ async def serve(o, host="0.0.0.0", port=50051):
         embeddings_pb2_grpc.add_EmbeddingsServiceServicer_to_server(o, server)
         services += ("embeddings.EmbeddingsService",)
 
+    if hasattr(o, "Rerank"):
+        rerank_pb2_grpc.add_RerankServiceServicer_to_server(o, server)
+        services += ("rerank.RerankService",)
+
+    if hasattr(o, "CountTokens"):
+        tokenize_pb2_grpc.add_TokenizeServiceServicer_to_server(o, server)
+        services += ("tokenize.TokenizeService",)
+
     if hasattr(o, "Name"):
         name_pb2_grpc.add_NameServiceServicer_to_server(o, server)
         services += ("name.NameService",)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: leapfrogai_sdk/tokenize/tokenize.proto
+# Protobuf Python Version: 4.25.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(
+    b'\n&leapfrogai_sdk/tokenize/tokenize.proto\x12\x08tokenize" \n\x0fTokenizeRequest\x12\r\n\x05texts\x18\x01 \x03(\t"%\n\x13\x43ountTokensResponse\x12\x0e\n\x06\x63ounts\x18\x01 \x03(\x05"\x15\n\x06Tokens\x12\x0b\n\x03ids\x18\x01 \x03(\x05"4\n\x10TokenizeResponse\x12 \n\x06tokens\x18\x01 \x03(\x0b\x32\x10.tokenize.Tokens2\x9d\x01\n\x0fTokenizeService\x12G\n\x0b\x43ountTokens\x12\x19.tokenize.TokenizeRequest\x1a\x1d.tokenize.CountTokensResponse\x12\x41\n\x08Tokenize\x12\x19.tokenize.TokenizeRequest\x1a\x1a.tokenize.TokenizeResponseB;Z9github.com/defenseunicorns/leapfrogai/pkg/client/tokenizeb\x06proto3'
+)
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(
+    DESCRIPTOR, "leapfrogai_sdk.tokenize.tokenize_pb2", _globals
+)
+if _descriptor._USE_C_DESCRIPTORS == False:
+    _globals["DESCRIPTOR"]._options = None
+    _globals[
+        "DESCRIPTOR"
+    ]._serialized_options = (
+        b"Z9github.com/defenseunicorns/leapfrogai/pkg/client/tokenize"
+    )
+    _globals["_TOKENIZEREQUEST"]._serialized_start = 52
+    _globals["_TOKENIZEREQUEST"]._serialized_end = 84
+    _globals["_COUNTTOKENSRESPONSE"]._serialized_start = 86
+    _globals["_COUNTTOKENSRESPONSE"]._serialized_end = 123
+    _globals["_TOKENS"]._serialized_start = 125
+    _globals["_TOKENS"]._serialized_end = 146
+    _globals["_TOKENIZERESPONSE"]._serialized_start = 148
+    _globals["_TOKENIZERESPONSE"]._serialized_end = 200
+    _globals["_TOKENIZESERVICE"]._serialized_start = 203
+    _globals["_TOKENIZESERVICE"]._serialized_end = 360
+# @@protoc_insertion_point(module_scope)
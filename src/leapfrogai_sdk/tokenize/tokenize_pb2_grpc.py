@@ -0,0 +1,126 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+
+from leapfrogai_sdk.tokenize import (
+    tokenize_pb2 as leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2,
+)
+
+
+class TokenizeServiceStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.CountTokens = channel.unary_unary(
+            "/tokenize.TokenizeService/CountTokens",
+            request_serializer=leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.TokenizeRequest.SerializeToString,
+            response_deserializer=leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.CountTokensResponse.FromString,
+        )
+        self.Tokenize = channel.unary_unary(
+            "/tokenize.TokenizeService/Tokenize",
+            request_serializer=leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.TokenizeRequest.SerializeToString,
+            response_deserializer=leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.TokenizeResponse.FromString,
+        )
+
+
+class TokenizeServiceServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def CountTokens(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def Tokenize(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+
+def add_TokenizeServiceServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+        "CountTokens": grpc.unary_unary_rpc_method_handler(
+            servicer.CountTokens,
+            request_deserializer=leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.TokenizeRequest.FromString,
+            response_serializer=leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.CountTokensResponse.SerializeToString,
+        ),
+        "Tokenize": grpc.unary_unary_rpc_method_handler(
+            servicer.Tokenize,
+            request_deserializer=leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.TokenizeRequest.FromString,
+            response_serializer=leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.TokenizeResponse.SerializeToString,
+        ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+        "tokenize.TokenizeService", rpc_method_handlers
+    )
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+# This class is part of an EXPERIMENTAL API.
+class TokenizeService(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def CountTokens(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/tokenize.TokenizeService/CountTokens",
+            leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.TokenizeRequest.SerializeToString,
+            leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.CountTokensResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def Tokenize(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/tokenize.TokenizeService/Tokenize",
+            leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.TokenizeRequest.SerializeToString,
+            leapfrogai__sdk_dot_tokenize_dot_tokenize__pb2.TokenizeResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
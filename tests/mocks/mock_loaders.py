@@ -0,0 +1,48 @@
+"""Document loaders that misbehave, for testing the parser's worker processes.
+
+They live outside the test modules so spawned workers can import them.
+"""
+
+import os
+import time
+from typing import Iterator
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+
+class MockLoader(BaseLoader):
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+
+class PagedLoader(MockLoader):
+    """Yields many small pages."""
+
+    def lazy_load(self) -> Iterator[Document]:
+        for page in range(1000):
+            yield Document(page_content=f"page {page}", metadata={"page": page})
+
+
+class SlowLoader(MockLoader):
+    """Takes far longer than any parser timeout."""
+
+    def lazy_load(self) -> Iterator[Document]:
+        time.sleep(600)
+        yield Document(page_content="too late")
+
+
+class GreedyLoader(MockLoader):
+    """Allocates more memory than the parser's memory limit allows."""
+
+    def lazy_load(self) -> Iterator[Document]:
+        data = bytearray(1024 * 1024 * 1024)
+        yield Document(page_content=str(len(data)))
+
+
+class CrashingLoader(MockLoader):
+    """Kills the worker process, as the OOM killer would."""
+
+    def lazy_load(self) -> Iterator[Document]:
+        os._exit(1)
+        yield
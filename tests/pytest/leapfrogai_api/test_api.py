@@ -22,6 +22,8 @@ LFAI_CONFIG_PATH = os.environ["LFAI_CONFIG_PATH"] = os.path.join(
     os.path.dirname(__file__), "fixtures"
 )
 LFAI_CONFIG_FILEPATH = os.path.join(LFAI_CONFIG_PATH, LFAI_CONFIG_FILENAME)
+# Disable background health checks so the reported backend status is deterministic
+os.environ["LFAI_HEALTH_CHECK_INTERVAL"] = "0"
 
 
 #########################
@@ -75,7 +77,14 @@ def test_config_load():
         assert response.status_code == 200
         assert response.json() == {
             "config_sources": {"repeater-test-config.yaml": ["repeater"]},
-            "models": {"repeater": {"backend": "localhost:50051", "name": "repeater"}},
+            "models": {
+                "repeater": {
+                    "backends": ["localhost:50051"],
+                    "name": "repeater",
+                    "routing": "round_robin",
+                    "status": {"localhost:50051": "unknown"},
+                }
+            },
         }
 
 
@@ -94,7 +103,14 @@ def test_config_delete(tmp_path):
 
         assert response.json() == {
             "config_sources": {"repeater-test-config.yaml": ["repeater"]},
-            "models": {"repeater": {"backend": "localhost:50051", "name": "repeater"}},
+            "models": {
+                "repeater": {
+                    "backends": ["localhost:50051"],
+                    "name": "repeater",
+                    "routing": "round_robin",
+                    "status": {"localhost:50051": "unknown"},
+                }
+            },
         }
         # delete source config from temp dir
         os.remove(tmp_config_filepath)
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from leapfrogai_api.utils.channel_pool import get_channel_pool
+from leapfrogai_api.utils.config import Config, Model
+from leapfrogai_api.utils.health import BackendHealth, get_backend_health
+
+
+def test_model_routes_across_replicas():
+    """Test that a model with several replicas spreads requests across them."""
+    model = Model(name="vllm", backends=["localhost:50051", "localhost:50052"])
+
+    assert model.for_request().backend == "localhost:50051"
+    assert model.for_request().backend == "localhost:50052"
+    assert model.for_request().backend == "localhost:50051"
+
+
+def test_config_accepts_backend_list():
+    """Test that a config can list several backends for one model."""
+    config = Config(models={}, config_sources={})
+    config.parse_models(
+        {
+            "models": [
+                {"name": "repeater", "backend": "localhost:50051"},
+                {
+                    "name": "vllm",
+                    "backends": ["localhost:50052", "localhost:50053"],
+                    "routing": "least_outstanding",
+                },
+            ]
+        },
+        "config.yaml",
+    )
+
+    assert config.models["repeater"].backends == ["localhost:50051"]
+    assert config.models["vllm"].backends == ["localhost:50052", "localhost:50053"]
+    assert config.get_model_backend("vllm").backend in config.models["vllm"].backends
+
+
+@pytest.mark.asyncio
+async def test_unreachable_replica_is_skipped():
+    """Test that replicas failing their health check stop receiving requests."""
+    model = Model(name="vllm", backends=["localhost:1", "localhost:50051"])
+
+    assert await get_backend_health().check("localhost:1", timeout=1) == "unreachable"
+    assert model.status["localhost:1"] == "unreachable"
+
+    for _ in range(3):
+        assert model.for_request().backend == "localhost:50051"
+
+    await get_backend_health().probe([], timeout=1)
+    assert model.status["localhost:1"] == "unknown"
+
+
+@pytest.mark.asyncio
+async def test_health_checks_are_not_counted_as_in_flight():
+    """Test that health probes do not use the pooled channels that routing counts."""
+    health = BackendHealth()
+
+    await health.check("localhost:1", timeout=1)
+
+    assert "localhost:1" not in get_channel_pool().stats()
+    await health.close()
+
+
+@pytest.mark.skipif(
+    os.environ.get("LFAI_RUN_REPEATER_TESTS") != "true",
+    reason="LFAI_RUN_REPEATER_TESTS envvar was not set to true",
+)
+@pytest.mark.asyncio
+async def test_serving_backend_is_healthy():
+    """Test that a running backend reports as serving."""
+    health = BackendHealth()
+    assert await health.check("localhost:50051", timeout=5) == "serving"
+    await health.close()
@@ -0,0 +1,34 @@
+import pytest
+
+from leapfrogai_api.utils.channel_pool import ChannelPool
+
+
+@pytest.mark.asyncio
+async def test_channel_is_reused():
+    """Test that repeated lookups for a backend share one channel."""
+    pool = ChannelPool(size=4, max_concurrent_streams=100)
+
+    first = pool.get("localhost:50051")
+    second = pool.get("localhost:50051")
+
+    assert first is second
+    assert pool.stats() == {"localhost:50051": [0]}
+
+    await pool.close()
+    assert pool.stats() == {}
+
+
+@pytest.mark.asyncio
+async def test_channels_are_keyed_by_backend():
+    """Test that each backend gets its own channel and can be discarded on its own."""
+    pool = ChannelPool()
+
+    first = pool.get("localhost:50051")
+    second = pool.get("localhost:50052")
+
+    assert first is not second
+
+    pool.discard("localhost:50051")
+    assert list(pool.stats().keys()) == ["localhost:50052"]
+
+    await pool.close()
@@ -0,0 +1,200 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+import pytest
+
+from leapfrogai_api.backend.rag import document_loader
+from leapfrogai_api.backend.rag.document_loader import (
+    DEFAULT_CHUNK_OVERLAP_TOKENS,
+    DEFAULT_CHUNK_SIZE_TOKENS,
+    DocumentParser,
+    DocumentParsingError,
+    InMemoryFile,
+    _load_tokenizer,
+    _text_splitter,
+    count_tokens,
+    load_chunks,
+    static_chunking_strategy,
+)
+from leapfrogai_api.backend.types import CreateVectorStoreFileRequest
+from tests.mocks.mock_loaders import (
+    CrashingLoader,
+    GreedyLoader,
+    PagedLoader,
+    SlowLoader,
+)
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "../../../../data")
+
+
+@pytest.mark.parametrize(
+    "filename, mime_type",
+    [
+        ("test.txt", "text/plain"),
+        ("test.csv", "text/csv"),
+        (
+            "test.xlsx",
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        ),
+    ],
+)
+def test_in_memory_file_sniffs_mime_type(filename, mime_type):
+    with open(os.path.join(TEST_DATA, filename), "rb") as source:
+        content = source.read()
+
+    with InMemoryFile(name=filename) as file:
+        file.file.write(content)
+
+        assert file.sniff_mime_type() == mime_type
+        # Other processes read the file through its path
+        with open(file.path, "rb") as reopened:
+            assert reopened.read() == content
+
+
+@pytest.mark.asyncio
+async def test_load_chunks_rejects_unsupported_files():
+    with InMemoryFile() as file:
+        with open(os.path.join(TEST_DATA, "0min12sec.wav"), "rb") as source:
+            file.file.write(source.read())
+
+        with pytest.raises(DocumentParsingError, match="Unsupported file type"):
+            async for _ in load_chunks(file):
+                pass
+
+
+@pytest.mark.asyncio
+async def test_parser_streams_documents_in_order():
+    parser = DocumentParser(
+        max_workers=1, timeout=30, handlers={"text/plain": PagedLoader}
+    )
+
+    documents = await parser.parse("unused", "text/plain")
+
+    assert [d.metadata["page"] for d in documents] == list(range(1000))
+
+
+@pytest.mark.asyncio
+async def test_parser_worker_is_released_when_caller_stops_early():
+    parser = DocumentParser(
+        max_workers=1, timeout=30, handlers={"text/plain": PagedLoader}
+    )
+
+    stream = parser.stream("unused", "text/plain")
+    assert (await anext(stream)).page_content == "page 0"
+    await stream.aclose()
+
+    # The only worker must have given up on the first file to parse this one
+    documents = await parser.parse("unused", "text/plain")
+    assert len(documents) == 1000
+
+
+@pytest.mark.asyncio
+async def test_parser_times_out():
+    parser = DocumentParser(
+        max_workers=1, timeout=1, handlers={"text/plain": SlowLoader}
+    )
+
+    start = time.monotonic()
+    with pytest.raises(DocumentParsingError) as exc_info:
+        await parser.parse("unused", "text/plain")
+
+    assert isinstance(exc_info.value.__cause__, TimeoutError)
+    assert time.monotonic() - start < 30
+
+
+@pytest.mark.asyncio
+async def test_parser_enforces_memory_limit():
+    parser = DocumentParser(
+        max_workers=1,
+        timeout=30,
+        memory_limit_mb=100,
+        handlers={"text/plain": GreedyLoader},
+    )
+
+    with pytest.raises(DocumentParsingError) as exc_info:
+        await parser.parse("unused", "text/plain")
+
+    assert isinstance(exc_info.value.__cause__, (MemoryError, BrokenProcessPool))
+
+
+@pytest.mark.asyncio
+async def test_parser_recovers_from_crashed_worker():
+    parser = DocumentParser(
+        max_workers=1,
+        timeout=30,
+        handlers={"text/plain": CrashingLoader, "text/csv": PagedLoader},
+    )
+
+    with pytest.raises(DocumentParsingError, match="Parser crashed") as exc_info:
+        await parser.parse("unused", "text/plain")
+    assert isinstance(exc_info.value.__cause__, BrokenProcessPool)
+
+    # A new pool replaces the broken one
+    assert len(await parser.parse("unused", "text/csv")) == 1000
+
+
+def test_text_splitter_measures_chunks_in_tokens():
+    text = " ".join(f"word{i}" for i in range(2000))
+
+    chunks = _text_splitter(chunk_size_tokens=100, chunk_overlap_tokens=10).split_text(
+        text
+    )
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
+
+
+@pytest.mark.parametrize(
+    "tokenizer", ["hkunlp/instructor-xl", "/nonexistent/tokenizer.json"]
+)
+def test_tokenizer_is_only_loaded_from_local_files(tokenizer):
+    _load_tokenizer.cache_clear()
+    try:
+        with patch.object(document_loader, "EMBEDDINGS_TOKENIZER", tokenizer):
+            assert _load_tokenizer() is None
+            assert count_tokens("a" * 400) == 100
+    finally:
+        _load_tokenizer.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "chunking_strategy, sizes",
+    [
+        (None, (DEFAULT_CHUNK_SIZE_TOKENS, DEFAULT_CHUNK_OVERLAP_TOKENS)),
+        (
+            {"type": "auto"},
+            (DEFAULT_CHUNK_SIZE_TOKENS, DEFAULT_CHUNK_OVERLAP_TOKENS),
+        ),
+        (
+            {
+                "type": "static",
+                "static": {"max_chunk_size_tokens": 800, "chunk_overlap_tokens": 400},
+            },
+            (800, 400),
+        ),
+    ],
+)
+def test_static_chunking_strategy(chunking_strategy, sizes):
+    static = static_chunking_strategy(chunking_strategy).static
+
+    assert (static.max_chunk_size_tokens, static.chunk_overlap_tokens) == sizes
+
+
+@pytest.mark.parametrize(
+    "max_chunk_size_tokens, chunk_overlap_tokens",
+    [(50, 0), (5000, 0), (200, 101), (200, -1)],
+)
+def test_invalid_static_chunking_strategy(max_chunk_size_tokens, chunk_overlap_tokens):
+    with pytest.raises(ValueError):
+        CreateVectorStoreFileRequest(
+            file_id="file-abc123",
+            chunking_strategy={
+                "type": "static",
+                "static": {
+                    "max_chunk_size_tokens": max_chunk_size_tokens,
+                    "chunk_overlap_tokens": chunk_overlap_tokens,
+                },
+            },
+        )
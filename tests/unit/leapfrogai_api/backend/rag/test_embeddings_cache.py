@@ -0,0 +1,151 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from leapfrogai_api.backend.rag import embeddings_cache, leapfrogai_embeddings
+from leapfrogai_api.backend.rag.embeddings_cache import (
+    DiskEmbeddingStore,
+    EmbeddingCache,
+    QueryEmbeddingCache,
+)
+from leapfrogai_api.backend.rag.leapfrogai_embeddings import LeapfrogAIEmbeddings
+from leapfrogai_api.backend.types import (
+    CreateEmbeddingResponse,
+    EmbeddingResponseData,
+    Usage,
+)
+from leapfrogai_api.utils.cache_key import cache_key
+from leapfrogai_api.utils.config import Model
+
+
+def test_cache_key_depends_on_model_and_text():
+    assert cache_key("model-a", "text") == cache_key("model-a", "text")
+    assert cache_key("model-a", "text") != cache_key("model-b", "text")
+    assert cache_key("model-a", "text") != cache_key("model-a", "other text")
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_evicts_least_recently_used():
+    cache = EmbeddingCache(max_size=2)
+
+    await cache.put_many({"a": [0.5], "b": [1.5]})
+    await cache.get_many(["a"])  # "b" is now the least recently used
+    await cache.put_many({"c": [2.5]})
+
+    assert await cache.get_many(["a", "b", "c"]) == {"a": [0.5], "c": [2.5]}
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+@pytest.mark.asyncio
+async def test_repeated_keys_are_counted_once():
+    cache = EmbeddingCache(max_size=10)
+    await cache.put_many({"a": [0.5]})
+
+    assert await cache.get_many(["a", "a", "b", "b", "b"]) == {"a": [0.5]}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+
+    await EmbeddingCache(store=DiskEmbeddingStore(path)).put_many({"a": [0.25, 0.75]})
+
+    cache = EmbeddingCache(store=DiskEmbeddingStore(path))
+    assert await cache.get_many(["a", "b"]) == {"a": [0.25, 0.75]}
+    # Entries read from disk are promoted to memory
+    cache.store = None
+    assert await cache.get_many(["a"]) == {"a": [0.25, 0.75]}
+
+
+@pytest.mark.asyncio
+async def test_only_uncached_texts_are_embedded():
+    requests = []
+
+    async def fake_create_embeddings(model, request):
+        requests.append(list(request.inputs))
+        return CreateEmbeddingResponse(
+            data=[
+                EmbeddingResponseData(embedding=[float(len(text))], index=i)
+                for i, text in enumerate(request.inputs)
+            ],
+            model=model.name,
+            usage=Usage(prompt_tokens=0, total_tokens=0),
+        )
+
+    embeddings = LeapfrogAIEmbeddings()
+    cache = EmbeddingCache()
+    with (
+        patch.object(embeddings_cache, "embeddings_cache", cache),
+        patch.object(
+            leapfrogai_embeddings, "create_embeddings", fake_create_embeddings
+        ),
+        patch.object(
+            LeapfrogAIEmbeddings,
+            "_get_model",
+            return_value=Model(name="text-embeddings", backends=["localhost:50051"]),
+        ),
+    ):
+        assert await embeddings.aembed_documents(["a", "bb", "a"]) == [
+            [1.0],
+            [2.0],
+            [1.0],
+        ]
+        assert await embeddings.aembed_documents(["bb", "ccc"]) == [[2.0], [3.0]]
+
+    assert requests == [["a", "bb"], ["ccc"]]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_query_cache_expires_entries():
+    cache = QueryEmbeddingCache(max_size=10, ttl=60)
+    cache.put("a", [0.5])
+
+    assert cache.get("a") == [0.5]
+    with patch.object(time, "monotonic", return_value=time.monotonic() + 61):
+        assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_query_cache_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_size=2, ttl=60)
+
+    cache.put("a", [0.5])
+    cache.put("b", [1.5])
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("c", [2.5])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [0.5]
+    assert cache.get("c") == [2.5]
+
+
+@pytest.mark.asyncio
+async def test_repeated_queries_are_embedded_once():
+    requests = []
+
+    async def fake_create_embeddings(model, request):
+        requests.append(list(request.inputs))
+        return CreateEmbeddingResponse(
+            data=[EmbeddingResponseData(embedding=[0.5], index=0)],
+            model=model.name,
+            usage=Usage(prompt_tokens=0, total_tokens=0),
+        )
+
+    embeddings = LeapfrogAIEmbeddings()
+    with (
+        patch.object(embeddings_cache, "query_embeddings_cache", QueryEmbeddingCache()),
+        patch.object(
+            leapfrogai_embeddings, "create_embeddings", fake_create_embeddings
+        ),
+        patch.object(
+            LeapfrogAIEmbeddings,
+            "_get_model",
+            return_value=Model(name="text-embeddings", backends=["localhost:50051"]),
+        ),
+    ):
+        for _ in range(3):
+            assert await embeddings.aembed_query("what is a frog?") == [0.5]
+
+    assert requests == [["what is a frog?"]]
@@ -0,0 +1,212 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_core.documents import Document
+
+from leapfrogai_api.backend.rag.index import (
+    FileAlreadyIndexedError,
+    IndexingLimiter,
+    IndexingQueue,
+    IndexingService,
+)
+from leapfrogai_api.backend.types import SearchMode
+from leapfrogai_api.data.crud_vector_content import CRUDVectorContent
+
+
+class ConcurrencyTracker:
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.finished = 0
+
+    async def job(self):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        self.finished += 1
+
+
+async def wait_for_jobs(queue: IndexingQueue):
+    while queue.pending:
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_queue_bounded_per_vector_store():
+    queue = IndexingQueue(IndexingLimiter(8, 2))
+    queue.start()
+    tracker = ConcurrencyTracker()
+
+    for _ in range(6):
+        await queue.submit("vs-1", tracker.job)
+    await wait_for_jobs(queue)
+
+    assert tracker.finished == 6
+    assert tracker.max_running == 2
+    # The limiter forgets vector stores once they have nothing left to index
+    assert queue.limiter._vector_store_slots == {}
+
+
+@pytest.mark.asyncio
+async def test_queue_bounded_globally():
+    queue = IndexingQueue(IndexingLimiter(3, 2))
+    queue.start()
+    tracker = ConcurrencyTracker()
+
+    for i in range(3):
+        for _ in range(3):
+            await queue.submit(f"vs-{i}", tracker.job)
+    await wait_for_jobs(queue)
+
+    assert tracker.finished == 9
+    assert tracker.max_running == 3
+
+
+@pytest.mark.asyncio
+async def test_queue_runs_inline_until_started():
+    queue = IndexingQueue(IndexingLimiter(8, 2))
+    tracker = ConcurrencyTracker()
+
+    await queue.submit("vs-1", tracker.job)
+
+    assert tracker.finished == 1
+    assert queue.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_stop_cancels_jobs():
+    queue = IndexingQueue(IndexingLimiter(8, 2))
+    queue.start()
+    cancelled = asyncio.Event()
+
+    async def job():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    await queue.submit("vs-1", job)
+    await asyncio.sleep(0)
+    await queue.stop()
+
+    assert cancelled.is_set()
+    assert queue.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_index_files_isolates_failures(mock_session):
+    async def fake_index_file(vector_store_id, file_id, chunking_strategy=None):
+        if file_id == "bad":
+            raise ValueError("File not found")
+        if file_id == "duplicate":
+            raise FileAlreadyIndexedError("File already indexed")
+        return file_id
+
+    with patch.object(IndexingService, "index_file", side_effect=fake_index_file):
+        responses = await IndexingService(db=mock_session).index_files(
+            "vs-1", ["good", "bad", "duplicate", "also-good"]
+        )
+
+    assert responses == ["good", "also-good"]
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.queries: list[str] = []
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        await asyncio.sleep(0.01)
+        return [[float(len(text))] for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        self.queries.append(text)
+        return [float(len(text))]
+
+
+@pytest.mark.asyncio
+async def test_document_stream_is_read_with_backpressure(mock_session):
+    produced = 0
+    max_buffered = 0
+    stored = 0
+
+    async def documents():
+        nonlocal produced, max_buffered
+        for i in range(50):
+            produced += 1
+            max_buffered = max(max_buffered, produced - stored)
+            yield Document(page_content=f"chunk {i}")
+
+    async def fake_add_vectors(vectors):
+        nonlocal stored
+        stored += len(vectors)
+        return [vector.content for vector in vectors]
+
+    with patch.object(CRUDVectorContent, "add_vectors", side_effect=fake_add_vectors):
+        service = IndexingService(db=mock_session)
+        service.embeddings = FakeEmbeddings()
+        ids = await service.aadd_document_stream(
+            documents(), "vs-1", "file-1", batch_size=5, concurrency=2
+        )
+
+    assert sorted(ids) == sorted(f"chunk {i}" for i in range(50))
+    # Batches being stored, batches queued and the one being filled, never the whole file
+    assert max_buffered <= 5 * (2 + 2 + 1)
+
+
+@pytest.mark.asyncio
+async def test_document_stream_stops_when_a_stage_fails(mock_session):
+    produced = 0
+
+    async def documents():
+        nonlocal produced
+        for i in range(1000):
+            produced += 1
+            yield Document(page_content=f"chunk {i}")
+
+    with patch.object(
+        CRUDVectorContent, "add_vectors", side_effect=RuntimeError("insert failed")
+    ):
+        service = IndexingService(db=mock_session)
+        service.embeddings = FakeEmbeddings()
+        with pytest.raises(RuntimeError):
+            await service.aadd_document_stream(
+                documents(), "vs-1", "file-1", batch_size=5, concurrency=2
+            )
+
+    assert produced < 1000
+
+
+@pytest.mark.asyncio
+async def test_similarity_search_multi_embeds_query_once(mock_session):
+    mock_session.rpc = MagicMock(return_value=AsyncMock())
+    service = IndexingService(db=mock_session)
+    service.embeddings = FakeEmbeddings()
+
+    await service.asimilarity_search_multi("query", ["vs-1", "vs-2", "vs-3"], k=5)
+
+    assert service.embeddings.queries == ["query"]
+    mock_session.rpc.assert_called_once()
+    name, params = mock_session.rpc.call_args.args
+    assert name == "match_vectors_multi"
+    assert params["vs_ids"] == ["vs-1", "vs-2", "vs-3"]
+    assert params["match_limit"] == 5
+
+
+@pytest.mark.asyncio
+async def test_hybrid_search_sends_query_text(mock_session):
+    mock_session.rpc = MagicMock(return_value=AsyncMock())
+    service = IndexingService(db=mock_session)
+    service.embeddings = FakeEmbeddings()
+
+    await service.asimilarity_search_multi(
+        "part AB-1234", ["vs-1"], k=3, mode=SearchMode.HYBRID
+    )
+
+    name, params = mock_session.rpc.call_args.args
+    assert name == "match_hybrid"
+    assert params["query_text"] == "part AB-1234"
+    assert params["query_embedding"] == [12.0]
+    assert params["vs_ids"] == ["vs-1"]
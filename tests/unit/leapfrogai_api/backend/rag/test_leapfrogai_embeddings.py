@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import grpc
+import pytest
+
+from leapfrogai_api.backend.rag import embeddings_cache, leapfrogai_embeddings
+from leapfrogai_api.backend.rag.embeddings_cache import EmbeddingCache
+from leapfrogai_api.backend.rag.leapfrogai_embeddings import (
+    LeapfrogAIEmbeddings,
+    sub_batches,
+)
+from leapfrogai_api.backend.types import (
+    CreateEmbeddingResponse,
+    EmbeddingResponseData,
+    Usage,
+)
+from leapfrogai_api.utils.config import Model
+
+
+@pytest.mark.parametrize(
+    "texts, max_size, max_characters, expected",
+    [
+        (["a", "b", "c"], 2, 100, [["a", "b"], ["c"]]),
+        (["aaa", "bbb", "c"], 10, 4, [["aaa"], ["bbb", "c"]]),
+        # A text over the character limit still gets sent, on its own
+        (["a", "bbbbbb", "c"], 10, 4, [["a"], ["bbbbbb"], ["c"]]),
+        ([], 10, 4, []),
+    ],
+)
+def test_sub_batches(texts, max_size, max_characters, expected):
+    assert list(sub_batches(texts, max_size, max_characters)) == expected
+
+
+@pytest.mark.asyncio
+async def test_sub_batches_are_reassembled_in_order_and_retried_individually():
+    requests = []
+    failed_once = set()
+
+    async def fake_create_embeddings(model, request):
+        inputs = list(request.inputs)
+        requests.append(inputs)
+        if "flaky" in inputs and "flaky" not in failed_once:
+            failed_once.add("flaky")
+            raise grpc.aio.AioRpcError(
+                grpc.StatusCode.UNAVAILABLE,
+                grpc.aio.Metadata(),
+                grpc.aio.Metadata(),
+            )
+        return CreateEmbeddingResponse(
+            data=[
+                EmbeddingResponseData(embedding=[float(len(text))], index=i)
+                for i, text in enumerate(inputs)
+            ],
+            model=model.name,
+            usage=Usage(prompt_tokens=0, total_tokens=0),
+        )
+
+    texts = ["a", "bb", "flaky", "dddd", "eeeee"]
+    with (
+        patch.object(embeddings_cache, "embeddings_cache", EmbeddingCache()),
+        patch.object(
+            leapfrogai_embeddings, "create_embeddings", fake_create_embeddings
+        ),
+        patch.object(leapfrogai_embeddings, "EMBEDDINGS_BATCH_SIZE", 2),
+        patch.object(leapfrogai_embeddings.asyncio, "sleep"),
+        patch.object(
+            LeapfrogAIEmbeddings,
+            "_get_model",
+            return_value=Model(name="text-embeddings", backends=["localhost:50051"]),
+        ),
+    ):
+        embeddings = await LeapfrogAIEmbeddings().aembed_documents(texts)
+
+    assert embeddings == [[float(len(text))] for text in texts]
+    # Only the sub-batch that failed was sent again
+    assert sorted(requests) == [
+        ["a", "bb"],
+        ["eeeee"],
+        ["flaky", "dddd"],
+        ["flaky", "dddd"],
+    ]
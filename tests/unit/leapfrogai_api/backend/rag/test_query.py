@@ -0,0 +1,168 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from postgrest.base_request_builder import SingleAPIResponse
+
+from leapfrogai_api.backend.rag import document_loader, query as query_module
+from leapfrogai_api.backend.rag.index import IndexingService
+from leapfrogai_api.backend.rag.query import (
+    QueryService,
+    fit_to_budget,
+    maximal_marginal_relevance,
+)
+from leapfrogai_api.data.crud_vector_content import CRUDVectorContent
+from leapfrogai_api.utils.config import Model
+
+
+def result(content: str, similarity: float = 0.5) -> dict:
+    return dict(
+        id=content,
+        vector_store_id="vs-1",
+        file_id="file-1",
+        content=content,
+        metadata={},
+        similarity=similarity,
+    )
+
+
+@patch.object(document_loader, "_load_tokenizer", lambda: None)
+def test_fit_to_budget_skips_results_that_do_not_fit():
+    # Without a tokenizer, tokens are estimated at 4 characters each
+    results = [result("a" * 40), result("b" * 400), result("c" * 40), result("d" * 40)]
+
+    kept = fit_to_budget(results, k=3, max_tokens=25)
+
+    assert [r["content"][0] for r in kept] == ["a", "c"]
+    assert len(fit_to_budget(results, k=3, max_tokens=None)) == 3
+
+
+@pytest.mark.asyncio
+async def test_rerank_over_fetches_and_reorders(mock_session):
+    candidates = [result(c) for c in ["one", "two", "three", "four"]]
+    searched_k = []
+
+    async def fake_search(query, vector_store_ids, k, mode):
+        searched_k.append(k)
+        return SingleAPIResponse(data=candidates[:k])
+
+    async def fake_rerank(model, request):
+        return [
+            {"one": 0.1, "two": 0.9, "three": 0.5, "four": 0.7}[d]
+            for d in request.documents
+        ]
+
+    model_config = MagicMock()
+    model_config.get_model_backend.return_value = Model(
+        name="reranker", backends=["localhost:50051"]
+    )
+
+    with (
+        patch.object(query_module, "RERANK_MODEL", "reranker"),
+        patch.object(query_module, "RERANK_CANDIDATES", 4),
+        patch.object(query_module, "get_model_config", return_value=model_config),
+        patch.object(query_module, "rerank", fake_rerank),
+        patch.object(
+            IndexingService, "asimilarity_search_multi", side_effect=fake_search
+        ),
+    ):
+        response = await QueryService(db=mock_session).query_rag_multi(
+            "query", ["vs-1"], k=2
+        )
+
+    assert searched_k == [4]
+    assert [r["content"] for r in response.data] == ["two", "four"]
+
+
+@pytest.mark.asyncio
+async def test_failed_rerank_keeps_search_order(mock_session):
+    candidates = [result(c) for c in ["one", "two", "three"]]
+
+    async def fake_search(query, vector_store_ids, k, mode):
+        return SingleAPIResponse(data=candidates[:k])
+
+    async def failing_rerank(model, request):
+        raise RuntimeError("reranker unavailable")
+
+    model_config = MagicMock()
+    model_config.get_model_backend.return_value = Model(
+        name="reranker", backends=["localhost:50051"]
+    )
+
+    with (
+        patch.object(query_module, "RERANK_MODEL", "reranker"),
+        patch.object(query_module, "get_model_config", return_value=model_config),
+        patch.object(query_module, "rerank", failing_rerank),
+        patch.object(
+            IndexingService, "asimilarity_search_multi", side_effect=fake_search
+        ),
+    ):
+        response = await QueryService(db=mock_session).query_rag_multi(
+            "query", ["vs-1"], k=2
+        )
+
+    assert [r["content"] for r in response.data] == ["one", "two"]
+
+
+def test_mmr_prefers_diverse_results():
+    relevance = [0.9, 0.85, 0.8]
+    # The second candidate points almost the same way as the first, the third doesn't
+    embeddings = [[1.0, 0.0], [0.9, 0.3], [0.0, 1.0]]
+
+    assert maximal_marginal_relevance(relevance, embeddings, lambda_mult=1.0) == [
+        0,
+        1,
+        2,
+    ]
+    assert maximal_marginal_relevance(relevance, embeddings, lambda_mult=0.5) == [
+        0,
+        2,
+        1,
+    ]
+
+
+def test_mmr_drops_near_duplicates():
+    relevance = [0.9, 0.89, 0.5]
+    embeddings = [[1.0, 0.0], [1.0, 0.01], [0.0, 1.0]]
+
+    assert maximal_marginal_relevance(
+        relevance, embeddings, lambda_mult=0.7, duplicate_threshold=0.95
+    ) == [0, 2]
+
+
+@pytest.mark.asyncio
+async def test_mmr_selects_from_candidate_pool(mock_session):
+    candidates = [
+        result("overlap a", 0.9),
+        result("overlap b", 0.88),
+        result("other", 0.7),
+        result("unused", 0.6),
+    ]
+    searched_k = []
+
+    async def fake_search(query, vector_store_ids, k, mode):
+        searched_k.append(k)
+        return SingleAPIResponse(data=[dict(c) for c in candidates[:k]])
+
+    async def fake_get_embeddings(ids):
+        vectors = {
+            "overlap a": [1.0, 0.0],
+            "overlap b": [1.0, 0.001],
+            "other": [0.0, 1.0],
+            "unused": [0.7, 0.7],
+        }
+        return {id_: vectors[id_] for id_ in ids}
+
+    with (
+        patch.object(
+            IndexingService, "asimilarity_search_multi", side_effect=fake_search
+        ),
+        patch.object(
+            CRUDVectorContent, "get_embeddings", side_effect=fake_get_embeddings
+        ),
+    ):
+        response = await QueryService(db=mock_session).query_rag_multi(
+            "query", ["vs-1"], k=2, mmr_lambda=0.5, mmr_candidates=3
+        )
+
+    assert searched_k == [3]
+    assert [r["content"] for r in response.data] == ["overlap a", "other"]
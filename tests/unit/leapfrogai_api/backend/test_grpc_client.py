@@ -0,0 +1,70 @@
+import asyncio
+from collections import OrderedDict
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import leapfrogai_sdk as lfai
+from leapfrogai_api.backend import grpc_client
+from leapfrogai_api.utils.config import Model
+
+
+@pytest.mark.asyncio
+async def test_token_counts_are_cached_per_model():
+    requests = []
+
+    class FakeTokenizeStub:
+        def __init__(self, channel):
+            pass
+
+        async def CountTokens(self, request):
+            requests.append(list(request.texts))
+            return lfai.CountTokensResponse(counts=[len(t) for t in request.texts])
+
+    model_a = Model(name="model-a", backends=["localhost:50051"])
+    model_b = Model(name="model-b", backends=["localhost:50051"])
+    with (
+        patch.object(grpc_client, "token_counts_cache", OrderedDict()),
+        patch.object(grpc_client, "TOKEN_COUNTS_CACHE_SIZE", 3),
+        patch.object(grpc_client, "get_channel_pool", MagicMock()),
+        patch.object(lfai, "TokenizeServiceStub", FakeTokenizeStub),
+    ):
+        assert await grpc_client.count_tokens(model_a, ["a", "bb", "a"]) == [1, 2, 1]
+        assert await grpc_client.count_tokens(model_a, ["bb", "ccc"]) == [2, 3]
+        assert await grpc_client.count_tokens(model_b, ["a"]) == [1]
+        # The least recently used count, model-a's "a", was evicted
+        assert await grpc_client.count_tokens(model_a, ["a"]) == [1]
+
+    assert requests == [["a", "bb"], ["ccc"], ["a"], ["a"]]
+
+
+@pytest.mark.asyncio
+async def test_token_counts_survive_eviction_during_a_request():
+    release_slow_request = asyncio.Event()
+
+    class FakeTokenizeStub:
+        def __init__(self, channel):
+            pass
+
+        async def CountTokens(self, request):
+            if "slow" in request.texts:
+                await release_slow_request.wait()
+            return lfai.CountTokensResponse(counts=[len(t) for t in request.texts])
+
+    model = Model(name="model", backends=["localhost:50051"])
+    with (
+        patch.object(grpc_client, "token_counts_cache", OrderedDict()),
+        patch.object(grpc_client, "TOKEN_COUNTS_CACHE_SIZE", 2),
+        patch.object(grpc_client, "get_channel_pool", MagicMock()),
+        patch.object(lfai, "TokenizeServiceStub", FakeTokenizeStub),
+    ):
+        assert await grpc_client.count_tokens(model, ["a"]) == [1]
+
+        # "a" is cached when this call starts, then evicted while it waits on "slow"
+        slow = asyncio.create_task(grpc_client.count_tokens(model, ["a", "slow"]))
+        await asyncio.sleep(0)
+        assert await grpc_client.count_tokens(model, ["bb", "ccc"]) == [2, 3]
+        release_slow_request.set()
+
+        assert await slow == [1, 4]
+        assert len(grpc_client.token_counts_cache) <= 2
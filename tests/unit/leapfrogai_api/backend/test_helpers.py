@@ -0,0 +1,81 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import leapfrogai_sdk as lfai
+from leapfrogai_api.backend.helpers import recv_chat, recv_completion
+
+
+class FakeStream:
+    """A gRPC response stream that sends some responses, then keeps generating forever."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.generating = asyncio.Event()
+        self.cancel = MagicMock()
+        self.wait_for_connection = AsyncMock()
+
+    async def __aiter__(self):
+        for response in self.responses:
+            yield response
+        self.generating.set()
+        await asyncio.Event().wait()
+
+
+def waiting_stream() -> FakeStream:
+    return FakeStream([])
+
+
+def chat_stream() -> FakeStream:
+    return FakeStream(
+        [
+            lfai.ChatCompletionResponse(
+                choices=[
+                    lfai.ChatCompletionChoice(chat_item=lfai.ChatItem(content=text))
+                ]
+            )
+            for text in ["a", "b"]
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_closing_the_consumer_cancels_the_call():
+    stream = chat_stream()
+    events = recv_chat(stream, "model")
+
+    assert (await anext(events)).startswith("data: ")
+    stream.cancel.assert_not_called()
+
+    await events.aclose()
+
+    stream.cancel.assert_called_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "recv, make_stream",
+    [
+        (recv_completion, waiting_stream),
+        (recv_chat, waiting_stream),
+        (recv_chat, chat_stream),
+    ],
+)
+async def test_cancelling_the_consumer_cancels_the_call(recv, make_stream):
+    stream = make_stream()
+    received = []
+
+    async def consume():
+        async for event in recv(stream, "model"):
+            received.append(event)
+
+    # Starlette cancels the task writing the response body when the client disconnects
+    task = asyncio.create_task(consume())
+    await asyncio.wait_for(stream.generating.wait(), timeout=5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    stream.cancel.assert_called_once()
+    assert len(received) == 2 * len(stream.responses)
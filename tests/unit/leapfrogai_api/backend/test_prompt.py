@@ -0,0 +1,187 @@
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import grpc
+import pytest
+from openai.types.beta import Thread
+from openai.types.beta.thread import ToolResources, ToolResourcesFileSearch
+from openai.types.beta.threads import Message, Text, TextContentBlock
+from openai.types.beta.threads.run_create_params import TruncationStrategy
+from postgrest.base_request_builder import SingleAPIResponse
+
+from leapfrogai_api.backend import grpc_client, prompt
+from leapfrogai_api.backend.prompt import truncate_messages
+from leapfrogai_api.backend.rag import document_loader
+from leapfrogai_api.backend.rag.query import QueryService
+from leapfrogai_api.backend.types import ChatMessage
+from leapfrogai_api.routers.openai.requests.run_create_params_request_base import (
+    RunCreateParamsRequestBase,
+)
+from leapfrogai_api.utils.config import Model
+
+
+def messages(count: int) -> list[ChatMessage]:
+    return [ChatMessage(content=str(i)) for i in range(count)]
+
+
+def thread_message(text: str, created_at: int) -> Message:
+    return Message(
+        id=str(created_at),
+        thread_id="thread",
+        created_at=created_at,
+        object="thread.message",
+        status="completed",
+        role="user",
+        content=[TextContentBlock(text=Text(value=text, annotations=[]), type="text")],
+    )
+
+
+def test_auto_truncation_keeps_the_most_recent_messages_that_fit():
+    kept = truncate_messages(messages(5), [10, 10, 30, 10, 10], max_tokens=35)
+
+    assert [m.content for m in kept] == ["3", "4"]
+
+
+def test_last_messages_truncation_caps_the_count():
+    kept = truncate_messages(
+        messages(5),
+        [10] * 5,
+        max_tokens=1000,
+        truncation_strategy=TruncationStrategy(type="last_messages", last_messages=3),
+    )
+
+    assert [m.content for m in kept] == ["2", "3", "4"]
+
+
+def test_latest_message_is_kept_even_when_too_long():
+    kept = truncate_messages(messages(2), [10, 100], max_tokens=50)
+
+    assert [m.content for m in kept] == ["1"]
+
+
+@pytest.mark.asyncio
+@patch.object(document_loader, "_load_tokenizer", lambda: None)
+async def test_chat_messages_fit_in_max_prompt_tokens(mock_session):
+    # Without a tokenizer, tokens are estimated at 4 characters each, plus 4 per message
+    thread_messages = [thread_message("a" * 400, i) for i in range(10)]
+    thread_messages.append(thread_message("question", 10))
+    query_max_tokens = []
+
+    async def fake_query_rag_multi(query, vector_store_ids, max_tokens, **kwargs):
+        query_max_tokens.append(max_tokens)
+        return SingleAPIResponse(
+            data=[
+                dict(
+                    id="chunk",
+                    vector_store_id="vs-1",
+                    file_id="file-1",
+                    content="c" * 200,
+                    metadata={},
+                    similarity=0.5,
+                )
+            ]
+        )
+
+    request = RunCreateParamsRequestBase(
+        instructions="be helpful", max_prompt_tokens=400
+    )
+    with (
+        patch.object(
+            RunCreateParamsRequestBase,
+            "list_messages",
+            AsyncMock(return_value=thread_messages),
+        ),
+        patch.object(QueryService, "query_rag_multi", side_effect=fake_query_rag_multi),
+    ):
+        chat_messages, file_ids = await request.create_chat_messages(
+            mock_session,
+            Thread(id="thread", created_at=0, object="thread"),
+            None,
+            ToolResources(
+                file_search=ToolResourcesFileSearch(vector_store_ids=["vs-1"])
+            ),
+        )
+
+    # A quarter of the budget, less the RAG message's header
+    assert query_max_tokens == [100 - 14]
+    # The instructions (7), the RAG message (65), the question (6) and 3 of the 104 token messages
+    assert [m.content[:1] for m in chat_messages] == ["b", "a", "a", "a", "H", "q"]
+    assert file_ids == ["file-1"]
+
+
+@pytest.mark.asyncio
+@patch.object(document_loader, "_load_tokenizer", lambda: None)
+async def test_message_tokens_are_estimated_without_tokenize_service():
+    model_config = MagicMock()
+    model_config.models = {"llm": Model(name="llm", backends=["localhost:50051"])}
+    error = grpc.aio.AioRpcError(
+        grpc.StatusCode.UNIMPLEMENTED, grpc.aio.Metadata(), grpc.aio.Metadata()
+    )
+    count_tokens = AsyncMock(side_effect=error)
+
+    untokenizable_models = {}
+
+    with (
+        patch.object(prompt, "get_model_config", return_value=model_config),
+        patch.object(prompt, "_untokenizable_models", untokenizable_models),
+        patch.object(grpc_client, "count_tokens", count_tokens),
+    ):
+        for _ in range(2):
+            assert await prompt.count_message_tokens(
+                "llm", [ChatMessage(content="a" * 40)]
+            ) == [14]
+
+        # The backend isn't asked again once it's known not to serve TokenizeService
+        assert count_tokens.await_count == 1
+
+        # ...until the retry interval has passed
+        assert untokenizable_models["llm"] > time.monotonic()
+        untokenizable_models["llm"] = time.monotonic()
+        await prompt.count_message_tokens("llm", [ChatMessage(content="a")])
+        assert count_tokens.await_count == 2
+
+
+@pytest.mark.asyncio
+@patch.object(document_loader, "_load_tokenizer", lambda: None)
+async def test_transient_tokenize_errors_are_not_remembered():
+    model_config = MagicMock()
+    model_config.models = {"llm": Model(name="llm", backends=["localhost:50051"])}
+    error = grpc.aio.AioRpcError(
+        grpc.StatusCode.UNAVAILABLE, grpc.aio.Metadata(), grpc.aio.Metadata()
+    )
+    count_tokens = AsyncMock(side_effect=[error, [10]])
+
+    with (
+        patch.object(prompt, "get_model_config", return_value=model_config),
+        patch.object(prompt, "_untokenizable_models", {}),
+        patch.object(grpc_client, "count_tokens", count_tokens),
+    ):
+        assert await prompt.count_message_tokens(
+            "llm", [ChatMessage(content="a" * 40)]
+        ) == [14]
+        assert await prompt.count_message_tokens(
+            "llm", [ChatMessage(content="a" * 40)]
+        ) == [14]
+
+    assert count_tokens.await_count == 2
+
+
+@pytest.mark.asyncio
+@patch.object(document_loader, "_load_tokenizer", lambda: None)
+async def test_unexpected_tokenize_errors_fall_back_to_estimates():
+    model_config = MagicMock()
+    model_config.models = {"llm": Model(name="llm", backends=["localhost:50051"])}
+    count_tokens = AsyncMock(side_effect=ValueError("unexpected response"))
+
+    with (
+        patch.object(prompt, "get_model_config", return_value=model_config),
+        patch.object(prompt, "_untokenizable_models", {}),
+        patch.object(grpc_client, "count_tokens", count_tokens),
+    ):
+        assert await prompt.count_message_tokens(
+            "llm", [ChatMessage(content="a" * 40)]
+        ) == [14]
+
+    count_tokens.assert_awaited_once()
+    # Counting tokens isn't a request to the model, so it doesn't take a turn in its routing
+    model_config.get_model_backend.assert_not_called()
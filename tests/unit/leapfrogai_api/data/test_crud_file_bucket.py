@@ -0,0 +1,64 @@
+import io
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from leapfrogai_api.data import crud_file_bucket
+from leapfrogai_api.data.crud_file_bucket import CRUDFileBucket
+
+# Captured before the tests patch httpx.AsyncClient
+RealAsyncClient = httpx.AsyncClient
+
+
+def _mock_client(signed_url: str) -> MagicMock:
+    client = MagicMock()
+    client.storage.from_.return_value.create_signed_url = AsyncMock(
+        return_value={"signedURL": signed_url, "signedUrl": signed_url}
+    )
+    return client
+
+
+@pytest.mark.asyncio
+async def test_download_to_streams_from_signed_url():
+    content = b"frog" * 100_000
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        return httpx.Response(200, content=content)
+
+    client = _mock_client("http://storage.local/object/sign/file_bucket/file-1?token=t")
+    file = io.BytesIO()
+    with patch.object(
+        crud_file_bucket.httpx,
+        "AsyncClient",
+        lambda: RealAsyncClient(transport=httpx.MockTransport(handler)),
+    ):
+        await CRUDFileBucket(db=client, model=MagicMock()).download_to(
+            id_="file-1", file=file, chunk_size=1024
+        )
+
+    assert file.getvalue() == content
+    assert requested == ["http://storage.local/object/sign/file_bucket/file-1?token=t"]
+    client.storage.from_.return_value.create_signed_url.assert_awaited_once_with(
+        path="file-1", expires_in=crud_file_bucket.SIGNED_URL_EXPIRES_IN
+    )
+
+
+@pytest.mark.asyncio
+async def test_download_to_raises_on_http_error():
+    client = _mock_client("http://storage.local/object/sign/file_bucket/missing")
+    with (
+        patch.object(
+            crud_file_bucket.httpx,
+            "AsyncClient",
+            lambda: RealAsyncClient(
+                transport=httpx.MockTransport(lambda request: httpx.Response(404))
+            ),
+        ),
+        pytest.raises(httpx.HTTPStatusError),
+    ):
+        await CRUDFileBucket(db=client, model=MagicMock()).download_to(
+            id_="missing", file=io.BytesIO()
+        )
@@ -0,0 +1,39 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from postgrest.types import ReturnMethod
+
+from leapfrogai_api.data.crud_vector_content import CRUDVectorContent, Vector
+
+
+@pytest.mark.asyncio
+async def test_add_vectors_inserts_every_row_in_one_request(mock_session):
+    mock_session.options.headers = {}
+    mock_table = MagicMock()
+    mock_table.insert.return_value.execute = AsyncMock(return_value=None)
+    mock_session.table = MagicMock(return_value=mock_table)
+
+    vectors = [
+        Vector(
+            vector_store_id="vs-1",
+            file_id="file-1",
+            content=f"chunk {i}",
+            metadata={"page": i},
+            embedding=[float(i)] * 3,
+        )
+        for i in range(3)
+    ]
+
+    ids = await CRUDVectorContent(db=mock_session).add_vectors(vectors)
+
+    mock_session.table.assert_called_once_with("vector_content")
+    mock_table.insert.assert_called_once()
+    (rows,), kwargs = mock_table.insert.call_args
+    assert kwargs == {"returning": ReturnMethod.minimal}
+
+    assert [row["content"] for row in rows] == ["chunk 0", "chunk 1", "chunk 2"]
+    assert all(row["user_id"] == "0" for row in rows)
+    assert all(uuid.UUID(row["id"]) for row in rows)
+    assert len({row["id"] for row in rows}) == 3
+    assert ids == [row["id"] for row in rows]
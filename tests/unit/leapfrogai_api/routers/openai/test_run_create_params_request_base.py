@@ -0,0 +1,66 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from openai.types.beta.thread import ToolResources
+
+import leapfrogai_sdk as lfai
+from leapfrogai_api.backend.converters import from_text_to_message
+from leapfrogai_api.routers.openai.requests import run_create_params_request_base
+from leapfrogai_api.routers.openai.requests.create_message_request import (
+    CreateMessageRequest,
+)
+from leapfrogai_api.routers.openai.requests.run_create_params_request import (
+    RunCreateParamsRequest,
+)
+
+from tests.mocks.mock_tables import mock_thread
+
+
+@pytest.mark.asyncio
+@patch.object(CreateMessageRequest, "create_message")
+@patch.object(RunCreateParamsRequest, "create_chat_messages")
+async def test_closing_the_run_stream_closes_the_chat_stream(
+    mock_create_chat_messages, mock_create_message, mock_session
+):
+    mock_create_chat_messages.return_value = ([], [])
+    mock_create_message.return_value = from_text_to_message("", [])
+    closed = asyncio.Event()
+
+    async def chat_complete_stream_raw(req, model_config):
+        try:
+            yield lfai.ChatCompletionResponse(
+                choices=[
+                    lfai.ChatCompletionChoice(chat_item=lfai.ChatItem(content="a"))
+                ]
+            )
+            await asyncio.Event().wait()
+        finally:
+            closed.set()
+
+    request = RunCreateParamsRequest(
+        assistant_id="123ab", model="test-model", stream=True
+    )
+    with patch.object(
+        run_create_params_request_base,
+        "chat_complete_stream_raw",
+        chat_complete_stream_raw,
+    ):
+        events = request.stream_generate_message_for_thread(
+            session=mock_session,
+            initial_messages=[],
+            thread=mock_thread,
+            ending_messages=[],
+            run_id="run_123",
+            tool_resources=ToolResources(),
+        )
+        async for event in events:
+            if "thread.message.delta" in event:
+                break
+
+        assert not closed.is_set()
+
+        await events.aclose()
+
+    assert closed.is_set()
+    mock_create_message.assert_awaited_once()
@@ -0,0 +1,100 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("InstructorEmbedding")
+
+spec = importlib.util.spec_from_file_location(
+    "text_embeddings_main",
+    Path(__file__).parents[3] / "packages" / "text-embeddings" / "main.py",
+)
+text_embeddings = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(text_embeddings)
+
+
+class FakeModel:
+    """Embeds each text as [len(text)] and records the batches it was asked to encode."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_batched():
+    model = FakeModel()
+    batcher = text_embeddings.EmbeddingBatcher(
+        model.encode, max_batch_size=64, max_batch_wait_ms=50
+    )
+
+    results = await asyncio.gather(
+        batcher.encode(["a", "bb"]),
+        batcher.encode(["ccc"]),
+        batcher.encode(["dddd", "eeeee", "ffffff"]),
+    )
+
+    assert model.batches == [["a", "bb", "ccc", "dddd", "eeeee", "ffffff"]]
+    assert results == [[[1.0], [2.0]], [[3.0]], [[4.0], [5.0], [6.0]]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_encoded_without_waiting():
+    model = FakeModel()
+    batcher = text_embeddings.EmbeddingBatcher(
+        model.encode, max_batch_size=2, max_batch_wait_ms=60_000
+    )
+
+    results = await asyncio.wait_for(
+        asyncio.gather(batcher.encode(["a"]), batcher.encode(["bb"])), timeout=5
+    )
+
+    assert model.batches == [["a", "bb"]]
+    assert results == [[[1.0]], [[2.0]]]
+
+
+@pytest.mark.asyncio
+async def test_batch_is_flushed_after_max_wait():
+    model = FakeModel()
+    batcher = text_embeddings.EmbeddingBatcher(
+        model.encode, max_batch_size=64, max_batch_wait_ms=10
+    )
+
+    first = await asyncio.wait_for(batcher.encode(["a"]), timeout=5)
+    second = await asyncio.wait_for(batcher.encode(["bb"]), timeout=5)
+
+    assert model.batches == [["a"], ["bb"]]
+    assert first == [[1.0]]
+    assert second == [[2.0]]
+
+
+@pytest.mark.asyncio
+async def test_encode_errors_reach_every_caller():
+    def failing_encode(texts):
+        raise RuntimeError("out of memory")
+
+    batcher = text_embeddings.EmbeddingBatcher(
+        failing_encode, max_batch_size=64, max_batch_wait_ms=50
+    )
+
+    results = await asyncio.gather(
+        batcher.encode(["a"]), batcher.encode(["bb"]), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_empty_inputs_are_not_queued():
+    model = FakeModel()
+    batcher = text_embeddings.EmbeddingBatcher(
+        model.encode, max_batch_size=64, max_batch_wait_ms=50
+    )
+
+    assert await batcher.encode([]) == []
+    assert batcher.worker is None
+    assert model.batches == []